@@ -1,10 +1,19 @@
-from datetime import datetime, timezone
+import sys
+if __name__ == "__main__":
+    # cron fast path: create/notify skip typer, rich markup and the interactive prompts entirely
+    import util.automation as automation
+    if automation.main(sys.argv[1:]):
+        sys.exit(0)
+from datetime import datetime, timedelta, timezone
 from typing import List
 import typer
 from models.RecurrenceType import RecurrenceType
+from models.Schedule import Schedule
+from models.Timeline import Timeline
 from models.Tournament import Tournament, load_tournaments, save_tournaments
 from models.TournamentType import TournamentType
-from models.UserInfo import UserInfo, load_user_info
+from models.Validation import validate_all
+from models.UserInfo import clear_user_info
 from models.lichess.ClockIncrement import ClockIncrement
 from models.lichess.ClockTime import ClockTime
 from models.lichess.GamesRestriction import GamesRestriction
@@ -12,13 +21,24 @@ from models.lichess.RatingRestriction import RatingRestriction
 from models.lichess.TournamentLength import TournamentLength
 from models.lichess.Variant import Variant
 import util.prompts as prompts
+from models.Accounts import load_accounts
+from models.CreatedIndex import CreatedIndex
+from models.CreatedStore import load_created_store
+import models.Overlaps as overlaps
 from models.config import Config, load_config
-from util.funi import success
+from util.funi import failure, success
 from rich import print
 from rich.markup import escape
-import util.lichess_api as lichess
+import util.automation as automation
+import util.bulk as bulk
+import util.metrics as metrics
+import util.scheduler as scheduler
+
+OVERLAPS_SHOWN = 10 # per team in analyze
 
 app = typer.Typer()
+accounts_app = typer.Typer(help='Run several lichess accounts (clubs) from one place')
+app.add_typer(accounts_app, name='accounts')
 
 @app.command()
 def setup(api_key: str = prompts.API_KEY, num_days: int = prompts.NUM_DAYS):
@@ -26,39 +46,28 @@ def setup(api_key: str = prompts.API_KEY, num_days: int = prompts.NUM_DAYS):
     Setup config file
     """
     Config(api_key, num_days).save()
+    # the stored username and teams may belong to the previous API key
+    clear_user_info()
     success('configured')
 
 @app.command()
-def refresh():
+def refresh(force: bool = typer.Option(False, help='Fetch everything again, e.g. after setting up a different API key')):
     """
     Refresh lichess information (your username and teams you lead)
     """
     config = load_config()
-    username = lichess.username(config.api_key)
-    teams = lichess.teams(config.api_key, username)
-    user = UserInfo(username, teams)
-    user.save()
+    user = automation.refresh_user(config, None if force else automation.stored_user())
     success(f'username: {user.username}, teams: {user.teams}')
 
 @app.command()
-def create():
+def create(concurrency: int = typer.Option(None, help='Max tournaments created at the same time (defaults to config value)')):
     """
     Creates configured tournaments within the next X days (from config file)
     """
     config = load_config()
-    user = load_user_info()
+    user = automation.current_user(config)
     tourneys = load_tournaments()
-    existing = lichess.my_tournaments(config.api_key, user.username)
-    to_create = [t for t in tourneys if t.is_valid() and not t.already_created(existing)]
-    to_create = [t for t in to_create if (t.get_next_date() - datetime.now(timezone.utc)).days <= config.num_days]
-    if len(to_create) == 0:
-        success('nothing to create')
-    else:
-        for tourney in to_create:
-            created = lichess.create_tournament(config.api_key, tourney)
-            tourney.last_id = created.id
-            save_tournaments(tourneys)
-            success(f'{created.full_name} created')
+    automation.create_due(config, user, tourneys, concurrency or config.concurrency)
 
 @app.command()
 def notify():
@@ -66,22 +75,51 @@ def notify():
     Sends out PMs to teams with tournaments starting in the next 24 hours (requires team and PM template to be set for the tournament)
     """
     config = load_config()
-    user = load_user_info()
+    user = automation.current_user(config)
     tourneys = load_tournaments()
-    existing = lichess.my_tournaments(config.api_key, user.username)
-    to_notify = [t for t in tourneys if t.needs_notification() and t.already_created(existing)]
-    if len(to_notify) == 0:
-        success('nothing to notify')
-    else:
-        utc_now = datetime.now(timezone.utc)
-        for tourney in to_notify:
-            tourney_match = next(t for t in existing if tourney.matches(t))
-            message = tourney.get_pm_message(tourney_match)
-            if message:
-                lichess.pm_team(config.api_key, tourney.team_restriction, message)
-                tourney.last_notified = utc_now
-                save_tournaments(tourneys)
-                success(f'{tourney.team_restriction} notified for {tourney_match.full_name}')
+    automation.notify_due(config, user, tourneys)
+
+@app.command()
+def run(concurrency: int = typer.Option(None, help='Max tournaments created at the same time (defaults to config value)')):
+    """
+    Runs create then notify in one go, loading files and reading your created tournaments from lichess only once
+    """
+    config = load_config()
+    user = automation.current_user(config)
+    tourneys = load_tournaments()
+    automation.run_due(config, user, tourneys, concurrency or config.concurrency)
+
+@app.command()
+def serve(status: bool = typer.Option(False, help='Show the queue and last run timings of a running scheduler instead')):
+    """
+    Runs create and notify in a long-running process, waking up exactly when the next one is due (instead of cron)
+    """
+    if status:
+        print(escape(scheduler.read_status()))
+        return
+    config = load_config()
+    user = automation.current_user(config)
+    tourneys = load_tournaments()
+    queue = scheduler.DeadlineQueue()
+    timeline = Timeline(tourneys, config.horizon())
+    queue.rebuild(tourneys, timeline)
+    success(f'scheduler started with {len(tourneys)} tournaments')
+    while True:
+        queue.sleep_until_next()
+        if queue.configs_changed():
+            config, tourneys = load_config(), load_tournaments()
+            user = automation.current_user(config)
+            timeline = Timeline(tourneys, config.horizon())
+        due = queue.pop_due()
+        if scheduler.CREATE in due:
+            queue.timed(scheduler.CREATE, lambda: automation.create_due(config, user, tourneys, config.concurrency))
+        if scheduler.NOTIFY in due:
+            queue.timed(scheduler.NOTIFY, lambda: automation.notify_due(config, user, tourneys))
+        if due:
+            metrics.export()
+        timeline.advance(datetime.now(timezone.utc))
+        queue.rebuild(tourneys, timeline, handled=len(due) > 0)
+        queue.write_status()
 
 @app.command()
 def new(type: TournamentType = prompts.TOURNEY_TYPE,
@@ -104,7 +142,7 @@ def new(type: TournamentType = prompts.TOURNEY_TYPE,
     """
     berserkable = prompts.berserkable_prompt(clock_time, clock_increment)
     position_FEN = prompts.position_fen_prompt(variant)
-    user_info = load_user_info()
+    user_info = automation.current_user(load_config(), revalidate=True)
     team_restriction = None
     num_leaders = 0
     if type == TournamentType.TeamBattle:
@@ -135,10 +173,12 @@ def edit():
     id = typer.prompt('Which tournament should be edited? Or 0 to cancel', type=int)
     if id > 0:
         tourney = tourneys[id-1]
+        # the team prompts list the teams you lead from the stored user info
+        automation.current_user(load_config(), revalidate=True)
         editing = True
         while editing:
             print()
-            for attribute,value in tourney.__dict__.items():
+            for attribute,value in tourney.properties().items():
                 print(escape(f'{attribute} = {value}'))
             tourney.is_valid(with_output=True)
             editing = prompts.edit_tournament_property_prompt(tourney)
@@ -146,12 +186,20 @@ def edit():
             success()
 
 @app.command()
-def list():
+def list(days: int = typer.Option(None, help='Instead list every occurrence starting in the next N days, in start order')):
     """
     Lists configured tournaments
     """
     tourneys = load_tournaments()
-    print_tourneys(tourneys)
+    if days is None:
+        print_tourneys(tourneys)
+        return
+    timeline = Timeline(tourneys, timedelta(days=days))
+    upcoming = timeline.between(timeline.now, timeline.end)
+    if len(upcoming) == 0:
+        success(f'nothing starts in the next {days} days')
+    for (starts_at, tourney) in upcoming:
+        print(escape(f'{starts_at:%Y-%m-%d %H:%M} UTC  {tourney.name} ({tourney.type.value})'))
 
 @app.command()
 def delete(all: bool = False, invalid: bool = False):
@@ -163,7 +211,7 @@ def delete(all: bool = False, invalid: bool = False):
         success('all gone')
     elif invalid:
         tourneys = load_tournaments()
-        valid = [t for t in tourneys if t.is_valid()]
+        valid = [t for (t, failed) in zip(tourneys, validate_all(tourneys)) if not failed]
         save_tournaments(valid)
         success('invalids removed')
     else:
@@ -178,12 +226,145 @@ def delete(all: bool = False, invalid: bool = False):
         message = '' if tournament is None else f'{tournament.name} deleted'
         success(message)
 
+@app.command()
+def analyze(days: int = typer.Option(14, help='How far ahead to look'),
+            stagger: bool = typer.Option(False, help='Suggest first_date_utc offsets that spread out overlapping starts'),
+            apply: bool = typer.Option(False, help='Save the suggested offsets (implies --stagger)'),
+            step: int = typer.Option(15, help='Offsets are multiples of this many minutes'),
+            max_shift: int = typer.Option(60, help='Largest offset in minutes, earlier or later')):
+    """
+    Reports tournaments for the same team that overlap, and the busiest times, over the next few days
+    """
+    tourneys = load_tournaments()
+    timeline = Timeline(tourneys, timedelta(days=days))
+    by_team = overlaps.team_intervals(timeline, timeline.now, timeline.end)
+    for (team, intervals) in sorted(by_team.items()):
+        result = overlaps.sweep(intervals)
+        print(escape(f'{team}: {len(intervals)} tournaments, at most {result.peak} at once ({result.peak_at:%Y-%m-%d %H:%M} UTC), {len(result.overlaps)} overlapping'))
+        for (first, second) in result.overlaps[:OVERLAPS_SHOWN]:
+            print(escape(f'    {second[0]:%Y-%m-%d %H:%M}  {first[2].name} / {second[2].name}'))
+        if len(result.overlaps) > OVERLAPS_SHOWN:
+            print(f'    ... and {len(result.overlaps) - OVERLAPS_SHOWN} more')
+    profile = overlaps.start_profile(timeline, timeline.now, timeline.end)
+    if len(profile):
+        (hour, count) = profile.most_common(1)[0]
+        success(f'busiest hour {hour:02}:00 UTC with {count} starts, quietest {min(range(24), key=lambda h: profile[h]):02}:00 UTC')
+    if not (stagger or apply):
+        return
+    # moving a config whose occurrences are already on lichess would orphan them and create the moved ones as well
+    created = CreatedIndex(load_created_store().upcoming())
+    claimed = set()
+    pinned = set()
+    for (starts_at, tourney) in timeline.between(timeline.now, timeline.end):
+        found = created.find_occurrence(tourney, starts_at, claimed)
+        if found is not None:
+            claimed.add(found.id)
+            pinned.add(tourney.uid)
+    for tourney in tourneys:
+        if tourney.uid in pinned:
+            failure(escape(f'{tourney.name}: already created on lichess within {days} days, left where it is'))
+    offsets = overlaps.stagger(tourneys, timeline, timeline.now, timeline.end, timedelta(minutes=step), timedelta(minutes=max_shift), pinned)
+    if len(offsets) == 0:
+        success('nothing to stagger')
+        return
+    for tourney in tourneys:
+        offset = offsets.get(tourney.uid)
+        if offset is None: continue
+        minutes = int(offset.total_seconds() // 60)
+        print(escape(f'{tourney.name}: {minutes:+} minutes ({tourney.first_date_utc:%H:%M} -> {tourney.first_date_utc + offset:%H:%M} UTC)'))
+        if apply:
+            tourney.first_date_utc += offset
+    if apply:
+        save_tournaments(tourneys)
+        success(f'{len(offsets)} tournaments moved')
+
+@app.command('import')
+def import_tourneys(path: str = typer.Argument(..., help='File to import, or - for stdin'),
+                    format: bulk.Format = typer.Option(None, help='Defaults to the file extension'),
+                    dry_run: bool = typer.Option(False, help='Only check the file, nothing is saved')):
+    """
+    Imports tournament configs from a CSV, JSONL or YAML file (same fields as the tournaments file), rows that fail validation are skipped
+    """
+    format = bulk.detect_format(path, format)
+    tourneys = load_tournaments()
+    imported = []
+    rejected = 0
+    with (sys.stdin if path == '-' else open(path, 'r', newline='', encoding='utf-8')) as inputFile:
+        for (number, tournament, error) in bulk.import_records(bulk.read_records(inputFile, format)):
+            if error:
+                rejected += 1
+                failure(escape(f'row {number}: {error}'))
+            else:
+                imported.append(tournament)
+    (added, updated) = bulk.merge(tourneys, imported)
+    if not dry_run and len(imported):
+        save_tournaments(tourneys)
+    success(f'{added} added, {updated} updated, {rejected} rejected' + (' (dry run, nothing saved)' if dry_run else ''))
+
+@app.command()
+def export(path: str = typer.Argument('-', help='File to write, or - for stdout'),
+           format: bulk.Format = typer.Option(None, help='Defaults to the file extension')):
+    """
+    Exports tournament configs as CSV, JSONL or YAML
+    """
+    tourneys = load_tournaments()
+    output = bulk.open_output(path)
+    try:
+        bulk.write_records(output, tourneys, bulk.detect_format(path, format) if path != '-' else format or bulk.Format.JSONL)
+    finally:
+        if output is not sys.stdout: output.close()
+    if path != '-':
+        success(f'{len(tourneys)} exported to {path}')
+
+@accounts_app.command('add')
+def accounts_add(name: str, directory: str = typer.Argument(..., help='Directory holding the account\'s config, user info and tournaments')):
+    """
+    Register an account directory (run setup and refresh inside it first)
+    """
+    registry = load_accounts()
+    registry.add(name, directory)
+    registry.save()
+    success(f'{name} added')
+
+@accounts_app.command('remove')
+def accounts_remove(name: str):
+    """
+    Unregister an account (its files are left alone)
+    """
+    registry = load_accounts()
+    registry.remove(name)
+    registry.save()
+    success(f'{name} removed')
+
+@accounts_app.command('list')
+def accounts_list():
+    """
+    Lists registered accounts
+    """
+    registry = load_accounts()
+    if len(registry.accounts) == 0:
+        success('there are no registered accounts')
+    for (i, (name, directory)) in enumerate(registry.accounts.items()):
+        print(escape(f'{i+1}:  {name} ({directory})'))
+
+@accounts_app.command('run')
+def accounts_run(command: automation.AccountCommand, workers: int = typer.Option(4, help='Accounts processed at the same time')):
+    """
+    Runs create, notify or refresh for every registered account in parallel, each with its own token and rate limits
+    """
+    registry = load_accounts()
+    results = automation.run_accounts(registry.accounts, command, workers)
+    for (name, error) in results.items():
+        if error: failure(escape(f'{name}: {error}'))
+        else: success(f'{name}: {command} done')
+
 def print_tourneys(tourneys: List[Tournament]):
     if len(tourneys) == 0:
         success('there are no saved tournaments')
         quit()
     else:
-        mapped = [tourney.describe() for tourney in tourneys]
+        schedule = Schedule(tourneys)
+        mapped = [tourney.describe(schedule.next_date(tourney)) for tourney in tourneys]
         for (i, desc) in enumerate(mapped):
             print(f'{i+1}:  {desc}')
 
@@ -0,0 +1,36 @@
+import json
+import os
+from typing import Dict
+import util.constants as constants
+from util.funi import failure
+
+class Accounts:
+    """
+    Registry of lichess accounts run from one place. Each account is a directory holding its own
+    config.json (token), user-info.json (username, teams) and tournaments.json
+    """
+    def __init__(self, accounts: Dict[str, str] = None):
+        self.accounts = accounts or {}
+
+    def add(self, name: str, directory: str):
+        self.accounts[name] = os.path.abspath(directory)
+
+    def remove(self, name: str):
+        self.accounts.pop(name, None)
+
+    def save(self):
+        with open(constants.ACCOUNTS_FILENAME, 'w') as accountsFile:
+            accountsFile.write(json.dumps(self.__dict__, indent=4))
+
+def load_accounts() -> Accounts:
+    if not os.path.exists(constants.ACCOUNTS_FILENAME):
+        return Accounts()
+    try:
+        with open(constants.ACCOUNTS_FILENAME, 'r') as accountsFile:
+            loaded = Accounts(**json.loads(accountsFile.read()))
+            if not isinstance(loaded.accounts, dict):
+                raise Warning('Accounts file is misconfigured')
+            return loaded
+    except:
+        failure('Accounts file is misconfigured')
+        quit()
@@ -0,0 +1,58 @@
+from datetime import datetime
+from typing import Dict, List
+from models.Schedule import Schedule
+from models.Templating import NameReplacement
+from models.lichess.TournamentResponse import TournamentResponse
+
+class CreatedIndex:
+    """
+    Lookup of created tournaments by id and by fingerprint (start time + clock + variant),
+    built once per run so matching configs against lichess is O(1) per config
+    """
+    def __init__(self, created: List[TournamentResponse]):
+        self.by_id: Dict[str, TournamentResponse] = {}
+        self.by_fingerprint: Dict[tuple, List[TournamentResponse]] = {}
+        for tourney in created:
+            self.by_id[tourney.id] = tourney
+            fingerprint = tourney.fingerprint()
+            if fingerprint is not None:
+                self.by_fingerprint.setdefault(fingerprint, []).append(tourney)
+
+    def find(self, tournament) -> TournamentResponse:
+        if not tournament.last_id: return None
+        return self.by_id.get(tournament.last_id)
+
+    def find_occurrence(self, tournament, starts_at: datetime, claimed: set = None) -> TournamentResponse:
+        """
+        The created tournament for one occurrence, last_id when it starts then, otherwise a fingerprint match
+        """
+        created = self.find(tournament)
+        if created is not None and (created.starts_at is None or created.starts_at == starts_at):
+            return created
+        return self.find_orphan(tournament, claimed or set(), starts_at)
+
+    def find_orphan(self, tournament, claimed: set, next_date: datetime = None) -> TournamentResponse:
+        candidates = self.by_fingerprint.get(tournament.fingerprint(next_date), [])
+        name = tournament.name
+        static_name = name and NameReplacement.WINNER.value not in name
+        for candidate in candidates:
+            if candidate.id in claimed: continue
+            if static_name and not (candidate.full_name or '').startswith(name): continue
+            return candidate
+        return None
+
+    def reattach_orphans(self, tournaments: List, schedule: Schedule = None) -> List:
+        """
+        Points configs at tournaments that were created for their next occurrence but whose id was never saved
+        """
+        claimed = {t.last_id for t in tournaments if self.find(t) is not None}
+        reattached = []
+        for tournament in tournaments:
+            if self.find(tournament) is not None: continue
+            next_date = schedule.next_date(tournament) if schedule else None
+            orphan = self.find_orphan(tournament, claimed, next_date)
+            if orphan is not None:
+                tournament.last_id = orphan.id
+                claimed.add(orphan.id)
+                reattached.append(tournament)
+        return reattached
@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta
+import json
+import os
+from typing import Dict, List
+import util.constants as constants
+from models.lichess.TournamentResponse import TournamentResponse
+
+FULL_SYNC_EVERY = timedelta(hours=24) # picks up tournaments deleted or created outside this tool
+
+class CreatedStore:
+    """
+    Local copy of the not yet started tournaments this account has created on lichess. The cursor is the latest start
+    time seen, syncs only read the created list (newest start first) down to it
+    """
+    def __init__(self, tournaments: List[dict] = None, cursor: str = None, full_sync_at: str = None):
+        self.by_id: Dict[str, TournamentResponse] = {}
+        self.cursor = datetime.fromisoformat(cursor) if cursor else None
+        self.full_sync_at = datetime.fromisoformat(full_sync_at) if full_sync_at else None
+        self.changed = False
+        for data in tournaments or []:
+            self.by_id[data['id']] = decode_created(data)
+
+    def upcoming(self) -> List[TournamentResponse]:
+        return list(self.by_id.values())
+
+    def needs_full_sync(self, now: datetime) -> bool:
+        return self.full_sync_at is None or now - self.full_sync_at > FULL_SYNC_EVERY
+
+    def prune(self, now: datetime):
+        # started tournaments drop off lichess' created list, so drop them here too
+        started = [id for (id, t) in self.by_id.items() if t.starts_at is not None and t.starts_at <= now]
+        for id in started:
+            del self.by_id[id]
+        self.changed = self.changed or len(started) > 0
+
+    def add(self, created: TournamentResponse):
+        self.by_id[created.id] = created
+        if created.starts_at is not None and (self.cursor is None or created.starts_at > self.cursor):
+            self.cursor = created.starts_at
+        self.changed = True
+
+    def merge(self, created: List[TournamentResponse]):
+        for tourney in created:
+            self.add(tourney)
+
+    def replace(self, created: List[TournamentResponse], now: datetime):
+        self.by_id = {}
+        self.cursor = None
+        self.merge(created)
+        self.full_sync_at = now
+        self.changed = True
+
+    def save(self):
+        if not self.changed: return
+        data = {
+            'cursor': self.cursor.isoformat() if self.cursor else None,
+            'full_sync_at': self.full_sync_at.isoformat() if self.full_sync_at else None,
+            'tournaments': [encode_created(t) for t in self.by_id.values()],
+        }
+        with open(constants.CREATED_STORE_FILENAME, 'w') as storeFile:
+            storeFile.write(json.dumps(data, indent=4))
+        self.changed = False
+
+def encode_created(tourney: TournamentResponse) -> dict:
+    return {
+        'id': tourney.id,
+        'name': tourney.full_name,
+        'starts_at': tourney.starts_at.isoformat() if tourney.starts_at else None,
+        'status': tourney.status,
+        'clock_limit': tourney.clock_limit,
+        'clock_increment': tourney.clock_increment,
+        'variant': tourney.variant,
+    }
+
+def decode_created(data: dict) -> TournamentResponse:
+    starts_at = datetime.fromisoformat(data['starts_at']) if data.get('starts_at') else None
+    return TournamentResponse(data['id'], data.get('name'), starts_at, data.get('clock_limit'), data.get('clock_increment'), data.get('variant'), data.get('status'))
+
+def load_created_store() -> CreatedStore:
+    if not os.path.exists(constants.CREATED_STORE_FILENAME):
+        return CreatedStore()
+    try:
+        with open(constants.CREATED_STORE_FILENAME, 'r') as storeFile:
+            return CreatedStore(**json.loads(storeFile.read()))
+    except (ValueError, KeyError, TypeError):
+        # only a copy of what lichess has, a full sync rebuilds it
+        return CreatedStore()
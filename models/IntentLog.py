@@ -0,0 +1,44 @@
+import json
+import os
+import threading
+from typing import List
+import util.constants as constants
+
+# a create goes planned -> posted (request about to be sent) -> confirmed (id journaled). One left at
+# posted after a crash may or may not exist on lichess, the next run looks for it before creating again
+PLANNED = 'planned'
+POSTED = 'posted'
+CONFIRMED = 'confirmed'
+
+_lock = threading.Lock()
+
+def record_intents(state: str, intents: List[tuple]):
+    """
+    Appends (tournament, fingerprint, created id or None) records with a single fsync
+    """
+    lines = [json.dumps({'uid': t.uid, 'fingerprint': fingerprint, 'state': state, 'id': id}) + '\n' for (t, fingerprint, id) in intents]
+    if len(lines) == 0: return
+    with _lock, open(constants.CREATE_INTENTS_FILENAME, 'a') as intentsFile:
+        intentsFile.writelines(lines)
+        intentsFile.flush()
+        os.fsync(intentsFile.fileno())
+
+def unfinished_intents() -> List[dict]:
+    """
+    Latest record of every create that got as far as posted but was never confirmed
+    """
+    if not os.path.exists(constants.CREATE_INTENTS_FILENAME):
+        return []
+    latest = {}
+    with open(constants.CREATE_INTENTS_FILENAME, 'r') as intentsFile:
+        for line in intentsFile:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue # torn write from a crash
+            latest[(record['uid'], tuple(record['fingerprint']))] = record
+    return [record for record in latest.values() if record['state'] == POSTED]
+
+def clear_intents():
+    if os.path.exists(constants.CREATE_INTENTS_FILENAME):
+        os.remove(constants.CREATE_INTENTS_FILENAME)
@@ -0,0 +1,101 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from models.Timeline import Timeline
+
+NO_TEAM = '(no team)'
+Interval = Tuple[datetime, datetime, object] # (start, end, tournament)
+
+class SweepResult:
+    def __init__(self, peak: int, peak_at: datetime, overlaps: List[Tuple[Interval, Interval]]):
+        self.peak = peak
+        self.peak_at = peak_at
+        self.overlaps = overlaps
+
+def teams_of(tournament) -> List[str]:
+    # team battles count against every team taking part
+    return tournament.team_restriction.split(',') if tournament.team_restriction else [NO_TEAM]
+
+def duration(tournament) -> timedelta:
+    return timedelta(minutes=tournament.length_mins.int_val())
+
+def team_intervals(timeline: Timeline, start: datetime, end: datetime) -> Dict[str, List[Interval]]:
+    by_team: Dict[str, List[Interval]] = {}
+    for (starts_at, tournament) in timeline.between(start, end):
+        for team in teams_of(tournament):
+            by_team.setdefault(team, []).append((starts_at, starts_at + duration(tournament), tournament))
+    return by_team
+
+def sweep(intervals: List[Interval]) -> SweepResult:
+    """
+    One pass over start/end events in time order: peak number running at once, and every overlapping pair.
+    Ends sort before starts at the same instant, so back to back tournaments don't count as overlapping
+    """
+    events = sorted([(s, 1, i) for (i, (s, _, _)) in enumerate(intervals)] + [(e, 0, i) for (i, (_, e, _)) in enumerate(intervals)])
+    active = set()
+    peak, peak_at = 0, None
+    overlaps = []
+    for (at, is_start, i) in events:
+        if not is_start:
+            active.discard(i)
+            continue
+        overlaps.extend((intervals[j], intervals[i]) for j in active)
+        active.add(i)
+        if len(active) > peak:
+            peak, peak_at = len(active), at
+    return SweepResult(peak, peak_at, overlaps)
+
+def start_profile(timeline: Timeline, start: datetime, end: datetime) -> Counter:
+    # starts per hour of the day (UTC), creation and player load follow the same shape
+    return Counter(starts_at.hour for (starts_at, _) in timeline.between(start, end))
+
+class Placed:
+    """
+    Intervals already placed for one team, as sorted starts and ends so counting overlaps with a new one is two bisects
+    """
+    def __init__(self):
+        self.starts = []
+        self.ends = []
+
+    def overlapping(self, start: datetime, end: datetime) -> int:
+        # placed intervals with start < end, minus those already over by start
+        return bisect_left(self.starts, end) - bisect_right(self.ends, start)
+
+    def add(self, start: datetime, end: datetime):
+        insort(self.starts, start)
+        insort(self.ends, end)
+
+def stagger(tournaments: List, timeline: Timeline, start: datetime, end: datetime, step: timedelta, max_shift: timedelta, pinned: set = frozenset()) -> Dict[str, timedelta]:
+    """
+    Greedy offsets for first_date_utc: tournaments with the most occurrences are placed first, each at the shift
+    (within +-max_shift, in steps) with the fewest overlaps in its teams, then the fewest other starts on the
+    same minute, then the smallest move. Pinned uids stay put and are placed before the rest. Returns the non-zero offsets by uid
+    """
+    occurrences: Dict[str, List[datetime]] = {}
+    for (starts_at, tournament) in timeline.between(start, end):
+        occurrences.setdefault(tournament.uid, []).append(starts_at)
+    candidates = [timedelta(0)]
+    shift = step
+    while shift <= max_shift:
+        candidates += [shift, -shift]
+        shift += step
+    placed: Dict[str, Placed] = {}
+    minutes = Counter()
+    offsets = {}
+    by_uid = {t.uid: t for t in tournaments}
+    for uid in sorted(occurrences, key=lambda uid: (uid not in pinned, -len(occurrences[uid]), occurrences[uid][0])):
+        tournament = by_uid[uid]
+        length = duration(tournament)
+        teams = [placed.setdefault(team, Placed()) for team in teams_of(tournament)]
+        def cost(offset: timedelta) -> tuple:
+            overlaps = sum(p.overlapping(s + offset, s + offset + length) for s in occurrences[uid] for p in teams)
+            return (overlaps, sum(minutes[s + offset] for s in occurrences[uid]), abs(offset))
+        best = timedelta(0) if uid in pinned else min(candidates, key=cost)
+        for s in occurrences[uid]:
+            for p in teams:
+                p.add(s + best, s + best + length)
+            minutes[s + best] += 1
+        if best:
+            offsets[uid] = best
+    return offsets
@@ -0,0 +1,37 @@
+import json
+import os
+import threading
+import util.constants as constants
+
+class ResultsCache:
+    """
+    Winners of finished tournaments by id, these never change so entries never expire
+    """
+    def __init__(self, winners: dict = None):
+        self.winners = winners or {}
+        self.changed = False
+        self.lock = threading.Lock()
+
+    def winner(self, tournament_id: str) -> str:
+        return self.winners.get(tournament_id)
+
+    def store(self, tournament_id: str, winner: str):
+        with self.lock:
+            self.winners[tournament_id] = winner
+            self.changed = True
+
+    def save(self):
+        if not self.changed: return
+        with open(constants.RESULTS_CACHE_FILENAME, 'w') as cacheFile:
+            cacheFile.write(json.dumps(self.winners, indent=4))
+        self.changed = False
+
+def load_results_cache() -> ResultsCache:
+    if not os.path.exists(constants.RESULTS_CACHE_FILENAME):
+        return ResultsCache()
+    try:
+        with open(constants.RESULTS_CACHE_FILENAME, 'r') as cacheFile:
+            return ResultsCache(json.loads(cacheFile.read()))
+    except ValueError:
+        # only a cache, start again rather than failing the run
+        return ResultsCache()
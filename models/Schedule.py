@@ -0,0 +1,54 @@
+from calendar import monthrange
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List
+from models.RecurrenceType import RecurrenceType
+
+RECURRENCE_PERIODS = {
+    RecurrenceType.DAILY: timedelta(days=1),
+    RecurrenceType.WEEKLY: timedelta(days=7),
+    RecurrenceType.FORTNIGHTLY: timedelta(days=14),
+}
+
+def monthly_date(first_date: datetime, year: int, month: int) -> datetime:
+    """
+    The monthly occurrence in the given month (months past 12 carry into the next year), on the month's last day
+    when it is shorter than the first date's day
+    """
+    (year, month) = (year + (month - 1) // 12, (month - 1) % 12 + 1)
+    return first_date.replace(year=year, month=month, day=min(first_date.day, monthrange(year, month)[1]))
+
+def next_dates(tournaments: List, now: datetime) -> List[datetime]:
+    """
+    Next occurrence of every tournament in one pass, grouped by recurrence type.
+    Fixed period recurrences are a single step from first_date_utc, monthly falls back to Tournament.get_next_date
+    """
+    result = [None] * len(tournaments)
+    groups: Dict[RecurrenceType, List[int]] = {}
+    for (i, tournament) in enumerate(tournaments):
+        groups.setdefault(tournament.recurrence, []).append(i)
+    for (recurrence, indexes) in groups.items():
+        period = RECURRENCE_PERIODS.get(recurrence)
+        for i in indexes:
+            first_date = tournaments[i].first_date_utc
+            if period is None:
+                result[i] = tournaments[i].get_next_date(now)
+            elif first_date >= now:
+                result[i] = first_date
+            else:
+                periods = -((first_date - now) // period) # ceil((now - first_date) / period)
+                result[i] = first_date + periods * period
+    return result
+
+class Schedule:
+    """
+    Next occurrences for a run, computed once against a single 'now' and shared by the commands
+    """
+    def __init__(self, tournaments: List, now: datetime = None):
+        self.now = now or datetime.now(timezone.utc)
+        self.dates = {id(t): date for (t, date) in zip(tournaments, next_dates(tournaments, self.now))}
+
+    def next_date(self, tournament) -> datetime:
+        date = self.dates.get(id(tournament))
+        if date is None:
+            date = self.dates[id(tournament)] = next_dates([tournament], self.now)[0]
+        return date
@@ -0,0 +1,47 @@
+from datetime import datetime
+import json
+import os
+from typing import List
+import util.constants as constants
+
+COMPACT_AFTER = 500 # records, folded back into the tournaments file on the next load past this
+
+def append_state(tournament, **fields):
+    """
+    Appends one small record of run state (last_id / last_notified) instead of rewriting the whole tournaments file
+    """
+    record = {'uid': tournament.uid}
+    for (key, value) in fields.items():
+        record[key] = value.isoformat() if isinstance(value, datetime) else value
+    with open(constants.STATE_JOURNAL_FILENAME, 'a') as journalFile:
+        journalFile.write(json.dumps(record) + '\n')
+        journalFile.flush()
+        os.fsync(journalFile.fileno())
+
+def replay_state(tournaments: List) -> int:
+    """
+    Applies journaled state on top of freshly loaded tournaments, returns how many records were read
+    """
+    if not os.path.exists(constants.STATE_JOURNAL_FILENAME):
+        return 0
+    by_uid = {t.uid: t for t in tournaments}
+    count = 0
+    with open(constants.STATE_JOURNAL_FILENAME, 'r') as journalFile:
+        for line in journalFile:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue # torn write from a crash, everything before it is still good
+            count += 1
+            tournament = by_uid.get(record.pop('uid', None))
+            if tournament is None:
+                continue
+            if 'last_id' in record:
+                tournament.last_id = record['last_id']
+            if 'last_notified' in record:
+                tournament.last_notified = datetime.fromisoformat(record['last_notified']) if record['last_notified'] else None
+    return count
+
+def clear_state():
+    if os.path.exists(constants.STATE_JOURNAL_FILENAME):
+        os.remove(constants.STATE_JOURNAL_FILENAME)
@@ -0,0 +1,42 @@
+from datetime import datetime
+from typing import Dict, List, Tuple
+from models.lichess.TournamentResponse import TournamentResponse
+
+MAX_PM_LENGTH = 9000 # lichess rejects longer team messages
+SEPARATOR = '\n\n'
+
+class TeamDigest:
+    """
+    One team PM covering every tournament for that team that needs a reminder, pm-all is throttled too tightly for one each
+    """
+    def __init__(self, team: str):
+        self.team = team
+        self.tournaments = []
+        self.messages = []
+        self.length = 0
+
+    def fits(self, message: str) -> bool:
+        return len(self.messages) == 0 or self.length + len(SEPARATOR) + len(message) <= MAX_PM_LENGTH
+
+    def add(self, tournament, message: str):
+        self.length += len(message) + (len(SEPARATOR) if self.messages else 0)
+        self.tournaments.append(tournament)
+        self.messages.append(message)
+
+    def message(self) -> str:
+        return SEPARATOR.join(self.messages)
+
+def plan_digests(due: List[Tuple[object, TournamentResponse, datetime]]) -> List[TeamDigest]:
+    """
+    Groups (tournament, created, starts_at) reminders by team_restriction in start order, starting another digest
+    for a team only when its message would get too long
+    """
+    by_team: Dict[str, List[TeamDigest]] = {}
+    for (tournament, created, starts_at) in sorted(due, key=lambda d: d[2]):
+        message = tournament.get_pm_message(created, starts_at)
+        if not message: continue
+        digests = by_team.setdefault(tournament.team_restriction, [])
+        if len(digests) == 0 or not digests[-1].fits(message):
+            digests.append(TeamDigest(tournament.team_restriction))
+        digests[-1].add(tournament, message)
+    return [digest for digests in by_team.values() for digest in digests]
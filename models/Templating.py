@@ -1,4 +1,8 @@
 from enum import StrEnum
+from functools import lru_cache
+import re
+from typing import Callable, List, Union
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 class NameReplacement(StrEnum):
     WINNER = '[winner]'
@@ -10,4 +14,61 @@ class TemplateReplacement(StrEnum):
     INCREMENT = '[clockincrement]'
     LINK = '[link]'
     BREAK = '[br]'
-    TIMEZONE = '\[timezone:[^\]]+\]' #regex match, used like [timezone:Europe/London]
\ No newline at end of file
+    TIMEZONE = '\[timezone:[^\]]+\]' #regex match, used like [timezone:Europe/London]
+
+TIMEZONE_FORMAT = '%Y-%m-%d %H:%M:%S (%Z)'
+PLACEHOLDERS = re.compile('|'.join([re.escape(r.value) for r in TemplateReplacement if r != TemplateReplacement.TIMEZONE] + [TemplateReplacement.TIMEZONE.value]))
+
+# context passed to render callbacks is (tournament, created: TournamentResponse, starts_at: datetime)
+RENDERERS = {
+    TemplateReplacement.NAME.value: lambda tournament, created, starts_at: created.full_name,
+    TemplateReplacement.VARIANT.value: lambda tournament, created, starts_at: tournament.variant.value,
+    TemplateReplacement.CLOCKTIME.value: lambda tournament, created, starts_at: tournament.clock_time.value,
+    TemplateReplacement.INCREMENT.value: lambda tournament, created, starts_at: tournament.clock_increment.value,
+    TemplateReplacement.LINK.value: lambda tournament, created, starts_at: f'https://lichess.org/tournament/{created.id}',
+    TemplateReplacement.BREAK.value: lambda tournament, created, starts_at: '\n',
+}
+
+class CompiledTemplate:
+    """
+    A PM template split once into literal text and render callbacks, so rendering is a single join
+    """
+    def __init__(self, segments: List[Union[str, Callable]], invalid_timezones: List[str]):
+        self.segments = segments
+        self.invalid_timezones = invalid_timezones
+
+    def render(self, tournament, created, starts_at) -> str:
+        return ''.join(s if isinstance(s, str) else s(tournament, created, starts_at) for s in self.segments)
+
+@lru_cache(maxsize=None)
+def get_zone(name: str) -> ZoneInfo:
+    try:
+        return ZoneInfo(name)
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+def timezone_renderer(zone: ZoneInfo) -> Callable:
+    return lambda tournament, created, starts_at: starts_at.astimezone(zone).strftime(TIMEZONE_FORMAT)
+
+@lru_cache(maxsize=1024)
+def compile_template(template: str) -> CompiledTemplate:
+    segments = []
+    invalid_timezones = []
+    position = 0
+    for match in PLACEHOLDERS.finditer(template):
+        if match.start() > position:
+            segments.append(template[position:match.start()])
+        placeholder = match.group(0)
+        renderer = RENDERERS.get(placeholder)
+        if renderer is None:
+            zone = get_zone(placeholder.replace('[timezone:', '').replace(']', ''))
+            if zone is None:
+                invalid_timezones.append(placeholder)
+                renderer = placeholder
+            else:
+                renderer = timezone_renderer(zone)
+        segments.append(renderer)
+        position = match.end()
+    if position < len(template):
+        segments.append(template[position:])
+    return CompiledTemplate(segments, invalid_timezones)
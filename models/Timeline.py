@@ -0,0 +1,91 @@
+from bisect import bisect_left, insort
+from datetime import datetime, timedelta
+from typing import Dict, List, Tuple
+from models.Schedule import RECURRENCE_PERIODS, Schedule, monthly_date
+
+class Timeline:
+    """
+    Every occurrence of every tournament from now until the horizon, kept sorted by start time so
+    'what starts between A and B' is a bisect. Stands in for a Schedule (now / next_date) as well
+    """
+    def __init__(self, tournaments: List, horizon: timedelta, schedule: Schedule = None):
+        self.schedule = schedule or Schedule(tournaments)
+        self.now = self.schedule.now
+        self.end = self.now + horizon
+        self.entries: List[Tuple[datetime, str]] = [] # (starts_at, uid)
+        self.tournaments: Dict[str, object] = {}
+        self.following: Dict[str, datetime] = {} # first occurrence of each tournament past the end
+        for tournament in tournaments:
+            self.tournaments[tournament.uid] = tournament
+            self.following[tournament.uid] = self.schedule.next_date(tournament)
+            self.entries.extend(self.fill(tournament))
+        self.entries.sort()
+
+    def fill(self, tournament) -> List[Tuple[datetime, str]]:
+        # moves the tournament's following occurrence up to the end, returning what it passed
+        added = []
+        date = self.following[tournament.uid]
+        while date < self.end:
+            added.append((date, tournament.uid))
+            date = following_date(tournament, date)
+        self.following[tournament.uid] = date
+        return added
+
+    def next_date(self, tournament) -> datetime:
+        return self.schedule.next_date(tournament)
+
+    def beyond(self, tournament) -> datetime:
+        """
+        First occurrence after the horizon, i.e. the next one that will need creating once the horizon moves on
+        """
+        return self.following[tournament.uid]
+
+    def between(self, start: datetime, end: datetime) -> List[Tuple[datetime, object]]:
+        """
+        (starts_at, tournament) for every occurrence with start <= starts_at < end, in start order
+        """
+        lo = bisect_left(self.entries, (start,))
+        hi = bisect_left(self.entries, (end,), lo)
+        return [(starts_at, self.tournaments[uid]) for (starts_at, uid) in self.entries[lo:hi]]
+
+    def first_each(self, start: datetime, end: datetime) -> List[Tuple[datetime, object]]:
+        # earliest occurrence per tournament in the range
+        seen = set()
+        first = []
+        for (starts_at, tournament) in self.between(start, end):
+            if tournament.uid in seen: continue
+            seen.add(tournament.uid)
+            first.append((starts_at, tournament))
+        return first
+
+    def add(self, tournament):
+        self.remove(tournament)
+        self.tournaments[tournament.uid] = tournament
+        self.following[tournament.uid] = self.schedule.next_date(tournament)
+        for entry in self.fill(tournament):
+            insort(self.entries, entry)
+
+    def remove(self, tournament):
+        if self.tournaments.pop(tournament.uid, None) is None:
+            return
+        del self.following[tournament.uid]
+        self.entries = [entry for entry in self.entries if entry[1] != tournament.uid]
+
+    def advance(self, now: datetime):
+        """
+        Moves the window on: drops occurrences that have started and adds the ones the new horizon reaches
+        """
+        horizon = self.end - self.now
+        self.now, self.end = now, now + horizon
+        self.schedule = Schedule(list(self.tournaments.values()), now)
+        del self.entries[:bisect_left(self.entries, (now,))]
+        for tournament in self.tournaments.values():
+            if self.following[tournament.uid] < self.end:
+                for entry in self.fill(tournament):
+                    insort(self.entries, entry)
+
+def following_date(tournament, date: datetime) -> datetime:
+    period = RECURRENCE_PERIODS.get(tournament.recurrence)
+    if period is not None:
+        return date + period
+    return monthly_date(tournament.first_date_utc, date.year, date.month + 1)
@@ -1,12 +1,11 @@
 from datetime import datetime, timedelta, timezone
 import json
 import os
-import re
 from typing import List
-from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
-import typer
-from models.Templating import NameReplacement, TemplateReplacement
+import uuid
+from models.Templating import NameReplacement, compile_template
 from models.RecurrenceType import RecurrenceType
+from models.Schedule import monthly_date
 from models.TournamentType import TournamentType
 from models.lichess.ClockTime import ClockTime
 from models.lichess.ClockIncrement import ClockIncrement
@@ -15,11 +14,19 @@ from models.lichess.RatingRestriction import RatingRestriction
 from models.lichess.TournamentLength import TournamentLength
 from models.lichess.TournamentResponse import TournamentResponse
 from models.lichess.Variant import Variant
+from models.Validation import MESSAGES, Rule, validate
+from models.StateJournal import COMPACT_AFTER, clear_state, replay_state
 import util.constants as constants
 from util.funi import failure, success
-from rich.markup import escape
+import util.metrics as metrics
 
 class Tournament:
+    # slots instead of a per-instance __dict__, configs can number in the tens of thousands
+    __slots__ = ('type', 'name', 'clock_time', 'clock_increment', 'length_mins', 'recurrence', 'first_date_utc',
+                 'variant', 'rated', 'positionFEN', 'berserkable', 'streakable', 'has_chat', 'description',
+                 'team_restriction', 'min_rating', 'max_rating', 'min_games', 'team_pm_template', 'last_notified',
+                 'last_id', 'num_leaders', 'uid')
+
     def __init__(self,
                  type: TournamentType,
                  name: str,
@@ -42,7 +49,8 @@ class Tournament:
                  team_pm_template: str,
                  last_notified: datetime,
                  last_id: str,
-                 num_leaders: int):
+                 num_leaders: int,
+                 uid: str = None):
         self.type = type
         self.name = name
         self.clock_time = clock_time
@@ -65,8 +73,13 @@ class Tournament:
         self.last_notified = last_notified
         self.last_id = last_id
         self.num_leaders = num_leaders
+        self.uid = uid or uuid.uuid4().hex
+
+    def properties(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
 
-    def describe(self) -> str:
+    def describe(self, next_date: datetime = None) -> str:
+        from rich.markup import escape # lazy, only needed for interactive output
         title = '[bold]{name}[/bold] ({type}) [italic]{description}[/italic]'
         if not self.is_valid():
             title += ' [red bold]INVALID[/red bold]'
@@ -79,10 +92,10 @@ class Tournament:
                                     time=self.clock_time.value,
                                     increment=self.clock_increment.value,
                                     variant=self.variant,
-                                    date=self.get_next_date().astimezone(local_timezone))
+                                    date=(next_date or self.get_next_date()).astimezone(local_timezone))
 
-    def get_next_date(self) -> datetime:
-        utc_now = datetime.now().astimezone(timezone.utc)
+    def get_next_date(self, now: datetime = None) -> datetime:
+        utc_now = now or datetime.now().astimezone(timezone.utc)
         if self.first_date_utc >= utc_now:
             return self.first_date_utc
         next_date = datetime(utc_now.year, utc_now.month, utc_now.day, self.first_date_utc.hour, self.first_date_utc.minute, self.first_date_utc.second, tzinfo=timezone.utc)
@@ -102,8 +115,9 @@ class Tournament:
                 if weeks_between % 2 != 0:
                     next_date += timedelta(days=7)
         elif self.recurrence == RecurrenceType.MONTHLY:
-            if next_date < utc_now or next_date.day != self.first_date_utc.day:
-                next_date = datetime(utc_now.year, utc_now.month + 1, self.first_date_utc.day, self.first_date_utc.hour, self.first_date_utc.minute, self.first_date_utc.second, tzinfo=timezone.utc)
+            next_date = monthly_date(self.first_date_utc, utc_now.year, utc_now.month)
+            if next_date < utc_now:
+                next_date = monthly_date(self.first_date_utc, utc_now.year, utc_now.month + 1)
         else:
             raise Warning(f'unhandled Recurrence type: {self.recurrence}')
         return next_date
@@ -111,66 +125,21 @@ class Tournament:
     def has_restrictions(self) -> bool:
         return (self.team_restriction is not None and self.type != TournamentType.TeamBattle) or self.min_rating != RatingRestriction.NONE or self.max_rating != RatingRestriction.NONE or self.min_games != GamesRestriction.NONE
 
-    def already_created(self, created: List[TournamentResponse]) -> bool:
-        return any(self.matches(t) for t in created)
-
-    def matches(self, existing: TournamentResponse) -> bool:
-        return self.last_id == existing.id
+    def fingerprint(self, next_date: datetime = None) -> tuple:
+        return (int((next_date or self.get_next_date()).timestamp()), int(self.clock_time.float_val() * 60), self.clock_increment.int_val(), self.variant.value)
 
     def is_valid(self, with_output: bool = False):
-        # conditions from https://github.com/lichess-org/lila/blob/master/modules/tournament/src/main/TournamentForm.scala
-        valid = True
-        if self.name and len(self.name) > 30:
-            if with_output: failure('[red bold]INVALID[/red bold] Name should be 30 characters or less')
-            valid = False
-        name_without_winner = self.name.replace(NameReplacement.WINNER.value, '')
-        if any(c != ' ' and not c.isalnum() for c in name_without_winner):
-            if with_output: failure('[red bold]INVALID[/red bold] Name should only have spaces or alphanumeric characters')
-            valid = False
-        if self.clock_time.float_val() + self.clock_increment.int_val() == 0:
-            if with_output: failure('[red bold]INVALID[/red bold] Clock time and increment must add to more than 0')
-            valid = False
-        if self.rated:
-            allow_rated = self.variant == Variant.STANDARD or self.clock_time.float_val() > 0 or self.clock_increment.int_val() > 1
-            if not allow_rated:
-                if with_output: failure('[red bold]INVALID[/red bold] Rated games require standard variant or longer clock_time / clock_increment')
-                valid = False
-        if self.berserkable:
-            clock_time_seconds = self.clock_time.float_val() * 60
-            if self.clock_increment.int_val() > (clock_time_seconds * 2):
-                if with_output: failure('[red bold]INVALID[/red bold] Berserkable requires increment to be <= 2 * clock time (in seconds)')
-                valid = False
-        if self.min_rating != RatingRestriction.NONE and self.max_rating != RatingRestriction.NONE:
-            if self.min_rating.int_val() >= self.max_rating.int_val():
-                if with_output: failure('[red bold]INVALID[/red bold] Min rating should be less than max rating')
-                valid = False
-        estimated_game_seconds = (60 * self.clock_time.float_val() + 30 * self.clock_increment.int_val()) * 2 * 0.8 + 15
-        estimated_number_of_games = (self.length_mins.int_val() * 60) / estimated_game_seconds
-        if estimated_number_of_games < 3:
-            if with_output: failure('[red bold]INVALID[/red bold] Increase tournament duration, or decrease game clock')
-            valid = False
-        if estimated_number_of_games > 150:
-            if with_output: failure('[red bold]INVALID[/red bold] Reduce tournament duration, or increase game clock')
-            valid = False
-        if self.team_pm_template and len(self.team_pm_template):
-            matches = re.findall(TemplateReplacement.TIMEZONE.value, self.team_pm_template)
-            for tzmatch in matches:
-                try:
-                    ZoneInfo(tzmatch.replace('[timezone:', '').replace(']', ''))
-                except ZoneInfoNotFoundError:
-                    if with_output: failure(f'[red bold]INVALID[/red bold] Invalid timezone: {escape(tzmatch)}')
-                    valid = False
-        if self.type == TournamentType.Swiss and self.team_restriction is None:
-            if with_output: failure('[red bold]INVALID[/red bold] Swiss tournaments must be restricted to a team')
-            valid = False
-        if self.type == TournamentType.TeamBattle:
-            if self.team_restriction is None or len(self.team_restriction.split(',')) <= 1:
-                if with_output: failure('[red bold]INVALID[/red bold] Team battles must have at least 2 teams')
-                valid = False
-            if self.num_leaders <= 0:
-                if with_output: failure('[red bold]INVALID[/red bold] Team battles must have at least 1 leader per team')
-                valid = False
-        return valid
+        failed = validate(self)
+        if with_output and failed:
+            from rich.markup import escape
+            for rule in Rule:
+                if rule not in failed: continue
+                if rule == Rule.TIMEZONE:
+                    for tzmatch in compile_template(self.team_pm_template).invalid_timezones:
+                        failure(f'[red bold]INVALID[/red bold] {MESSAGES[rule]}: {escape(tzmatch)}')
+                else:
+                    failure(f'[red bold]INVALID[/red bold] {MESSAGES[rule]}')
+        return not failed
 
     def get_name(self, previous_winner: str):
         winner = '' if not previous_winner else ''.join([c for c in previous_winner if c.isalnum()])
@@ -188,73 +157,87 @@ class Tournament:
                     return without_winner
         return name
 
-    def get_pm_message(self, created: TournamentResponse):
+    def get_pm_message(self, created: TournamentResponse, starts_at: datetime = None):
         if not self.team_pm_template or not self.team_restriction:
             return None
-        message = self.team_pm_template
-        message = message.replace(TemplateReplacement.NAME.value, created.full_name)
-        message = message.replace(TemplateReplacement.VARIANT.value, self.variant.value)
-        message = message.replace(TemplateReplacement.CLOCKTIME.value, self.clock_time.value)
-        message = message.replace(TemplateReplacement.INCREMENT.value, self.clock_increment.value)
-        message = message.replace(TemplateReplacement.LINK.value, f'https://lichess.org/tournament/{created.id}')
-        message = message.replace(TemplateReplacement.BREAK.value, '\n')
-        matches = re.findall(TemplateReplacement.TIMEZONE.value, message)
-        starts_at = self.get_next_date()
-        for tzmatch in matches:
-            tz = ZoneInfo(tzmatch.replace('[timezone:', '').replace(']', ''))
-            localized = starts_at.astimezone(tz).strftime('%Y-%m-%d %H:%M:%S (%Z)')
-            message = message.replace(tzmatch, localized)
-        return message
+        return compile_template(self.team_pm_template).render(self, created, starts_at or self.get_next_date())
 
-    def needs_notification(self):
+    def needs_notification(self, next_date: datetime = None, now: datetime = None):
         if not self.team_pm_template or not self.team_restriction:
             return False
-        utc_now = datetime.now(timezone.utc)
-        next_date = self.get_next_date()
+        utc_now = now or datetime.now(timezone.utc)
+        next_date = next_date or self.get_next_date(utc_now)
         if (next_date - utc_now).days > 0:
             return False
         return self.last_notified is None or (next_date - self.last_notified).days > 1
         
 
-def tournament_json_serializer(obj):
-    if isinstance(obj, Tournament):
-        return obj.__dict__
-    if isinstance(obj, datetime):
-        return obj.isoformat()
-    return obj
+ENUM_FIELDS = {
+    'type': TournamentType,
+    'clock_time': ClockTime,
+    'clock_increment': ClockIncrement,
+    'length_mins': TournamentLength,
+    'recurrence': RecurrenceType,
+    'variant': Variant,
+    'min_rating': RatingRestriction,
+    'max_rating': RatingRestriction,
+    'min_games': GamesRestriction
+}
+# value -> member tables built once, cheaper than an enum constructor call per field per record
+ENUM_DECODERS = tuple((key, {member.value: member for member in enum}) for (key, enum) in ENUM_FIELDS.items())
+DATETIME_FIELDS = ('first_date_utc', 'last_notified')
+
+def encode_tournament(tournament: Tournament) -> dict:
+    data = {name: getattr(tournament, name) for name in Tournament.__slots__}
+    for key in DATETIME_FIELDS:
+        if data[key] is not None:
+            data[key] = data[key].isoformat()
+    return data
 
 def tournament_json_decoder(data):
-    enum_mappings = {
-        'type': TournamentType,
-        'clock_time': ClockTime,
-        'clock_increment': ClockIncrement,
-        'length_mins': TournamentLength,
-        'recurrence': RecurrenceType,
-        'variant': Variant,
-        'min_rating': RatingRestriction,
-        'max_rating': RatingRestriction,
-        'min_games': GamesRestriction
-    }
-    for (key, type) in enum_mappings.items():
-        data[key] = type(data[key])
+    for (key, members) in ENUM_DECODERS:
+        value = data[key]
+        member = members.get(value)
+        # fall back to the enum itself so bad values still raise the usual ValueError
+        data[key] = member if member is not None else ENUM_FIELDS[key](value)
     data['first_date_utc'] = datetime.fromisoformat(data['first_date_utc'])
     if data['last_notified']:
         data['last_notified'] = datetime.fromisoformat(data['last_notified'])
     return Tournament(**data)
 
+def encode_tournaments(tourneys: List[Tournament]) -> List[dict]:
+    return [encode_tournament(t) for t in tourneys]
+
+def decode_tournaments(data: List[dict]) -> List[Tournament]:
+    return [tournament_json_decoder(d) for d in data]
+
 def save_tournaments(tourneys: List[Tournament]):
-    with open(constants.TOURNAMENTS_FILENAME, 'w') as tourneysFile:
-        tourneysFile.write(json.dumps(tourneys, default=tournament_json_serializer, indent=4))
+    # write then rename, so a crash mid-write leaves the previous file intact
+    temp_filename = f'{constants.TOURNAMENTS_FILENAME}.tmp'
+    with metrics.phase('save_tournaments', count=len(tourneys)), open(temp_filename, 'w') as tourneysFile:
+        tourneysFile.write(json.dumps(encode_tournaments(tourneys), indent=4))
+        tourneysFile.flush()
+        os.fsync(tourneysFile.fileno())
+    os.replace(temp_filename, constants.TOURNAMENTS_FILENAME)
+    # the journaled state is now part of the file
+    clear_state()
 
 def load_tournaments() -> List[Tournament]:
     try:
         if not os.path.exists(constants.TOURNAMENTS_FILENAME):
             return []
         with open(constants.TOURNAMENTS_FILENAME, 'r') as tourneysFile:
-            return json.loads(tourneysFile.read(), object_hook=tournament_json_decoder)
+            data = json.loads(tourneysFile.read())
+        # files from before the state journal have no uids, they need saving once so journal records can find them
+        missing_uids = any('uid' not in d for d in data)
+        tourneys = decode_tournaments(data)
+        if replay_state(tourneys) > COMPACT_AFTER or missing_uids:
+            save_tournaments(tourneys)
+        return tourneys
     except:
         failure('Failed to read tournaments file')
         if os.path.exists(constants.TOURNAMENTS_FILENAME):
+            import typer # lazy, keeps typer out of the non-interactive startup path
             do_reset = typer.prompt("Do you want to delete the tournaments file and start again?", type=bool)
             if (do_reset): os.remove(constants.TOURNAMENTS_FILENAME)
             success()
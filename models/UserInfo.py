@@ -1,12 +1,18 @@
+from datetime import datetime, timedelta, timezone
 import json
+import os
 from typing import List
 import util.constants as constants
 from util.funi import failure
 
+TTL = timedelta(hours=6) # how long the teams you lead are trusted before lichess is asked again
+
 class UserInfo:
-    def __init__(self, username: str, teams: List[str] = []):
+    def __init__(self, username: str, teams: List[str] = [], checked_at: str = None, validators: dict = None):
         self.username = username
         self.teams = teams
+        self.checked_at = checked_at # iso time lichess last confirmed the teams
+        self.validators = validators or {} # etag / last_modified of the team list, for conditional requests
 
     def add_team(self, team_id: str):
         if team_id not in self.teams:
@@ -16,6 +22,16 @@ class UserInfo:
         if team_id in self.teams:
             self.teams.remove(team_id)
 
+    def is_stale(self, now: datetime = None) -> bool:
+        if not self.checked_at:
+            return True
+        now = now or datetime.now(timezone.utc)
+        return now - datetime.fromisoformat(self.checked_at) > TTL
+
+    def mark_checked(self, validators: dict, now: datetime = None):
+        self.checked_at = (now or datetime.now(timezone.utc)).isoformat()
+        self.validators = validators or {}
+
     def save(self):
         with open(constants.USER_INFO_FILENAME, 'w') as userFile:
             userFile.write(json.dumps(self.__dict__, indent=4))
@@ -29,4 +45,8 @@ def load_user_info() -> UserInfo:
             return loaded
     except:
         failure('User info file not found or misconfigured, try running the refresh command')
-        quit()
\ No newline at end of file
+        quit()
+
+def clear_user_info():
+    if os.path.exists(constants.USER_INFO_FILENAME):
+        os.remove(constants.USER_INFO_FILENAME)
@@ -0,0 +1,96 @@
+from enum import IntFlag
+from functools import lru_cache
+from typing import Dict, List
+from models.Templating import NameReplacement, compile_template
+from models.TournamentType import TournamentType
+from models.lichess.ClockIncrement import ClockIncrement
+from models.lichess.ClockTime import ClockTime
+from models.lichess.RatingRestriction import RatingRestriction
+from models.lichess.TournamentLength import TournamentLength
+from models.lichess.Variant import Variant
+
+# conditions from https://github.com/lichess-org/lila/blob/master/modules/tournament/src/main/TournamentForm.scala
+class Rule(IntFlag):
+    NAME_LENGTH = 1 << 0
+    NAME_CHARACTERS = 1 << 1
+    NO_CLOCK = 1 << 2
+    RATED_VARIANT = 1 << 3
+    BERSERK_INCREMENT = 1 << 4
+    RATING_RANGE = 1 << 5
+    TOO_FEW_GAMES = 1 << 6
+    TOO_MANY_GAMES = 1 << 7
+    TIMEZONE = 1 << 8
+    SWISS_TEAM = 1 << 9
+    BATTLE_TEAMS = 1 << 10
+    BATTLE_LEADERS = 1 << 11
+
+MESSAGES = {
+    Rule.NAME_LENGTH: 'Name should be 30 characters or less',
+    Rule.NAME_CHARACTERS: 'Name should only have spaces or alphanumeric characters',
+    Rule.NO_CLOCK: 'Clock time and increment must add to more than 0',
+    Rule.RATED_VARIANT: 'Rated games require standard variant or longer clock_time / clock_increment',
+    Rule.BERSERK_INCREMENT: 'Berserkable requires increment to be <= 2 * clock time (in seconds)',
+    Rule.RATING_RANGE: 'Min rating should be less than max rating',
+    Rule.TOO_FEW_GAMES: 'Increase tournament duration, or decrease game clock',
+    Rule.TOO_MANY_GAMES: 'Reduce tournament duration, or increase game clock',
+    Rule.TIMEZONE: 'Invalid timezone',
+    Rule.SWISS_TEAM: 'Swiss tournaments must be restricted to a team',
+    Rule.BATTLE_TEAMS: 'Team battles must have at least 2 teams',
+    Rule.BATTLE_LEADERS: 'Team battles must have at least 1 leader per team',
+}
+
+def estimated_games(clock_time: ClockTime, clock_increment: ClockIncrement, length: TournamentLength) -> float:
+    estimated_game_seconds = (60 * clock_time.float_val() + 30 * clock_increment.int_val()) * 2 * 0.8 + 15
+    return (length.int_val() * 60) / estimated_game_seconds
+
+@lru_cache(maxsize=None)
+def games_rule(clock_time: ClockTime, clock_increment: ClockIncrement, length: TournamentLength) -> Rule:
+    # only a handful of clock / length combinations are ever used, so each is worked out once on first use
+    games = estimated_games(clock_time, clock_increment, length)
+    return Rule.TOO_FEW_GAMES if games < 3 else Rule.TOO_MANY_GAMES if games > 150 else Rule(0)
+
+_results: Dict[tuple, Rule] = {}
+
+def validation_key(t) -> tuple:
+    # every field a rule reads, so an edit to any of them is a cache miss
+    return (t.name, t.clock_time, t.clock_increment, t.length_mins, t.variant, t.rated, t.berserkable,
+            t.min_rating, t.max_rating, t.team_pm_template, t.type, t.team_restriction, t.num_leaders)
+
+def validate(tournament) -> Rule:
+    """
+    Bitmask of the rules the tournament fails (0 when valid), memoized on the fields the rules read
+    """
+    key = validation_key(tournament)
+    failed = _results.get(key)
+    if failed is None:
+        failed = _results[key] = evaluate(tournament)
+    return failed
+
+def validate_all(tournaments: List) -> List[Rule]:
+    return [validate(t) for t in tournaments]
+
+def evaluate(t) -> Rule:
+    failed = games_rule(t.clock_time, t.clock_increment, t.length_mins)
+    if t.name and len(t.name) > 30:
+        failed |= Rule.NAME_LENGTH
+    if any(c != ' ' and not c.isalnum() for c in t.name.replace(NameReplacement.WINNER.value, '')):
+        failed |= Rule.NAME_CHARACTERS
+    clock_time, increment = t.clock_time.float_val(), t.clock_increment.int_val()
+    if clock_time + increment == 0:
+        failed |= Rule.NO_CLOCK
+    if t.rated and not (t.variant == Variant.STANDARD or clock_time > 0 or increment > 1):
+        failed |= Rule.RATED_VARIANT
+    if t.berserkable and increment > clock_time * 60 * 2:
+        failed |= Rule.BERSERK_INCREMENT
+    if t.min_rating != RatingRestriction.NONE and t.max_rating != RatingRestriction.NONE and t.min_rating.int_val() >= t.max_rating.int_val():
+        failed |= Rule.RATING_RANGE
+    if t.team_pm_template and len(compile_template(t.team_pm_template).invalid_timezones):
+        failed |= Rule.TIMEZONE
+    if t.type == TournamentType.Swiss and t.team_restriction is None:
+        failed |= Rule.SWISS_TEAM
+    if t.type == TournamentType.TeamBattle:
+        if t.team_restriction is None or len(t.team_restriction.split(',')) <= 1:
+            failed |= Rule.BATTLE_TEAMS
+        if t.num_leaders <= 0:
+            failed |= Rule.BATTLE_LEADERS
+    return failed
@@ -1,11 +1,19 @@
+from datetime import timedelta
 import json
 import util.constants as constants
+from util.rate_limiter import configured_rates
 from util.funi import failure
 
 class Config:
-    def __init__(self, api_key: str, num_days: int):
+    def __init__(self, api_key: str, num_days: int, concurrency: int = 4, rate_limits: dict = None):
         self.api_key = api_key
         self.num_days = num_days
+        self.concurrency = concurrency
+        self.rate_limits = rate_limits # per endpoint class overrides of util.rate_limiter.DEFAULT_RATES
+
+    def horizon(self) -> timedelta:
+        # how far ahead create works, an occurrence is due once (starts_at - now).days <= num_days
+        return timedelta(days=self.num_days + 1)
 
     def save(self):
         with open(constants.CONFIG_FILENAME, 'w') as configFile:
@@ -15,8 +23,9 @@ def load_config() -> Config:
     try:
         with open(constants.CONFIG_FILENAME, 'r') as configFile:
             loaded = Config(**json.loads(configFile.read()))
-            if not isinstance(loaded.api_key, str) or not isinstance(loaded.num_days, int):
+            if not isinstance(loaded.api_key, str) or not isinstance(loaded.num_days, int) or not isinstance(loaded.concurrency, int):
                 raise Warning('Config is misconfigured')
+            configured_rates(loaded.rate_limits)
             return loaded
     except:
         failure('Config file not found or misconfigured, try running the setup command')
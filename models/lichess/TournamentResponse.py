@@ -1,4 +1,15 @@
+from datetime import datetime
+
 class TournamentResponse:
-    def __init__(self, id: str, full_name: str):
+    def __init__(self, id: str, full_name: str, starts_at: datetime = None, clock_limit: int = None, clock_increment: int = None, variant: str = None, status: int = None):
         self.id = id
-        self.full_name = full_name
\ No newline at end of file
+        self.full_name = full_name
+        self.starts_at = starts_at
+        self.clock_limit = clock_limit
+        self.clock_increment = clock_increment
+        self.variant = variant
+        self.status = status # lichess status, 10 = created (not started yet)
+
+    def fingerprint(self) -> tuple:
+        if self.starts_at is None: return None
+        return (int(self.starts_at.timestamp()), self.clock_limit, self.clock_increment, self.variant)
@@ -0,0 +1,125 @@
+"""
+Micro-benchmarks for the scheduling, naming, validation and serialization hot paths
+    python tools/bench.py --update        record a baseline on this machine (tools/bench-baseline.json, not committed)
+    python tools/bench.py                 compare against it, exit 1 on regressions
+    python tools/bench.py --max-size 100000
+Synthetic sets cover every tournament type, recurrence type and variant, with a frozen clock. Timings are
+absolute, so a baseline only means something on the machine that recorded it: record one before a change
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+from synthetic import synthetic_tournaments
+import models.Validation as validation
+from models.Schedule import Schedule
+from models.Tournament import decode_tournaments, encode_tournaments, load_tournaments, save_tournaments
+from models.lichess.TournamentResponse import TournamentResponse
+
+BASELINE = os.path.join(ROOT, 'tools', 'bench-baseline.json')
+FROZEN_NOW = datetime(2026, 3, 14, 15, 9, 26, tzinfo=timezone.utc)
+SIZES = [10, 100, 1000, 10000, 100000]
+TEAMS = ['club-a', 'club-b', 'club-c']
+
+def bench_next_date(tourneys):
+    for t in tourneys: t.get_next_date(FROZEN_NOW)
+
+def bench_schedule(tourneys):
+    Schedule(tourneys, FROZEN_NOW)
+
+def bench_is_valid(tourneys):
+    validation._results.clear() # cold, every config evaluated
+    for t in tourneys: t.is_valid()
+
+def bench_is_valid_cached(tourneys):
+    for t in tourneys: t.is_valid()
+
+def bench_get_name(tourneys):
+    for t in tourneys: t.get_name('SomeVeryLongPreviousWinnerName')
+
+def bench_pm_message(tourneys):
+    created = TournamentResponse('abcdefgh', 'Series Arena', FROZEN_NOW)
+    for t in tourneys: t.get_pm_message(created, FROZEN_NOW)
+
+def bench_describe(tourneys):
+    for t in tourneys: t.describe(FROZEN_NOW)
+
+def bench_decode(tourneys):
+    decode_tournaments(json.loads(json.dumps(encode_tournaments(tourneys))))
+
+def bench_save_load(tourneys):
+    save_tournaments(tourneys)
+    load_tournaments()
+
+BENCHMARKS = {
+    'get_next_date': bench_next_date,
+    'schedule_batch': bench_schedule,
+    'is_valid': bench_is_valid,
+    'is_valid_cached': bench_is_valid_cached,
+    'get_name': bench_get_name,
+    'get_pm_message': bench_pm_message,
+    'describe': bench_describe,
+    'json_decode': bench_decode,
+    'save_load_tournaments': bench_save_load,
+}
+
+def measure(bench, tourneys, repeats: int) -> float:
+    # best of N, per tournament in microseconds
+    best = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        bench(tourneys)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best / len(tourneys) * 1_000_000
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for litourney hot paths')
+    parser.add_argument('--update', action='store_true', help='write results as the new baseline')
+    parser.add_argument('--max-size', type=int, default=10000)
+    parser.add_argument('--tolerance', type=float, default=1.5, help='slowdown factor vs baseline that counts as a regression')
+    parser.add_argument('--only', nargs='*', help='benchmark names to run')
+    args = parser.parse_args()
+
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE, 'r') as f: baseline = json.load(f)
+    results = {}
+    regressions = []
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        for size in [s for s in SIZES if s <= args.max_size]:
+            tourneys = synthetic_tournaments(size, FROZEN_NOW, TEAMS)
+            repeats = max(1, min(20, 20000 // size))
+            for (name, bench) in BENCHMARKS.items():
+                if args.only and name not in args.only: continue
+                micros = round(measure(bench, tourneys, repeats), 3)
+                results.setdefault(name, {})[str(size)] = micros
+                previous = baseline.get(name, {}).get(str(size))
+                flag = ''
+                if previous and micros > previous * args.tolerance:
+                    flag = '  REGRESSION'
+                    regressions.append(f'{name}@{size}')
+                print(f'{name:<22} {size:>7} {micros:>10.2f} us/tournament  (baseline ' + (f'{previous:.2f}' if previous else 'none') + f'){flag}')
+    if args.update:
+        for (name, sizes) in results.items():
+            baseline.setdefault(name, {}).update(sizes)
+        with open(BASELINE, 'w') as f: f.write(json.dumps(baseline, indent=4))
+        print(f'baseline written to {BASELINE}')
+        return 0
+    if len(baseline) == 0:
+        print('no baseline recorded on this machine yet, run with --update first')
+    if regressions:
+        print(f'regressions: {", ".join(regressions)}')
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
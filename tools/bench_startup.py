@@ -0,0 +1,117 @@
+"""
+Startup time benchmark for the cron commands: python tools/bench_startup.py --baseline-ref main
+Runs each command against an empty working directory, with LICHESS_BASE_URL pointing at tools/fake_lichess.py
+for anything that still asks lichess, and fails if the median is more than 25% slower than the baseline.
+With --baseline-ref the baseline is that git ref, checked out in a temporary worktree and measured in the same
+session, runs alternating between the two. Refs older than the fake server can't be pointed at it, so for those
+only the commands that never call lichess are compared. Without --baseline-ref the baseline is
+tools/startup-baseline.json, which only means something on the machine that recorded it, so record it there
+first with --update
+"""
+import argparse
+from contextlib import contextmanager
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+import fake_lichess
+
+BASELINE = os.path.join(ROOT, 'tools', 'startup-baseline.json')
+RUNS = 15
+TOLERANCE = 1.25
+COMMANDS = {
+    'notify': ['notify'],
+    'list': ['list'],
+    'help': ['--help'],
+}
+NETWORK_COMMANDS = {'notify'} # before the cron fast path it read the created list even with nothing to notify
+
+def measure(roots, args, env: dict) -> list:
+    # median per tree, the runs alternate between trees so changes in machine load hit them all alike
+    workdirs = [tempfile.TemporaryDirectory() for _ in roots]
+    try:
+        for workdir in workdirs:
+            with open(os.path.join(workdir.name, 'config.json'), 'w') as f: f.write('{"api_key": "x", "num_days": 7}')
+            with open(os.path.join(workdir.name, 'user-info.json'), 'w') as f: f.write('{"username": "x", "teams": []}')
+        timings = [[] for _ in roots]
+        for _ in range(RUNS):
+            for (i, root) in enumerate(roots):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, os.path.join(root, 'litourney.py'), *args], cwd=workdirs[i].name, env=env, stdout=subprocess.DEVNULL, check=True)
+                timings[i].append(time.perf_counter() - start)
+        return [statistics.median(t) for t in timings]
+    finally:
+        for workdir in workdirs:
+            workdir.cleanup()
+
+@contextmanager
+def worktree(ref: str):
+    path = tempfile.mkdtemp(prefix='bench-startup-')
+    subprocess.run(['git', 'worktree', 'add', '--detach', path, ref], cwd=ROOT, stdout=subprocess.DEVNULL, check=True)
+    try:
+        yield path
+    finally:
+        subprocess.run(['git', 'worktree', 'remove', '--force', path], cwd=ROOT, check=True)
+
+def report(results: dict, baseline: dict, label: str) -> bool:
+    regressed = False
+    for (name, seconds) in results.items():
+        previous = baseline.get(name)
+        flag = ''
+        if previous and seconds > previous * TOLERANCE:
+            flag = '  REGRESSION'
+            regressed = True
+        print(f'{name:<8} {seconds * 1000:8.1f} ms  ({label} ' + (f'{previous * 1000:.1f} ms' if previous else 'none') + f'){flag}')
+    return regressed
+
+def supports_fake_server(path: str) -> bool:
+    with open(os.path.join(path, 'util', 'lichess_api.py'), 'r') as f:
+        return 'LICHESS_BASE_URL' in f.read()
+
+def compare_ref(ref: str, env: dict) -> int:
+    results, baseline = {}, {}
+    with worktree(ref) as path:
+        offline = not supports_fake_server(path)
+        if offline:
+            print(f'{ref} always talks to lichess.org, comparing only {", ".join(n for n in COMMANDS if n not in NETWORK_COMMANDS)}')
+        for (name, args) in COMMANDS.items():
+            if offline and name in NETWORK_COMMANDS: continue
+            (results[name], baseline[name]) = measure([ROOT, path], args, env)
+    return 1 if report(results, baseline, ref) else 0
+
+def compare_file(update: bool, env: dict) -> int:
+    results = {name: round(measure([ROOT], args, env)[0], 4) for (name, args) in COMMANDS.items()}
+    baseline = {}
+    if os.path.exists(BASELINE):
+        with open(BASELINE, 'r') as f: baseline = json.load(f)
+    regressed = report(results, baseline, 'baseline')
+    if update:
+        with open(BASELINE, 'w') as f: f.write(json.dumps(results, indent=4))
+        print(f'baseline written to {BASELINE}')
+        return 0
+    if len(baseline) == 0:
+        print('no baseline recorded on this machine yet, run with --update first or compare with --baseline-ref')
+    return 1 if regressed else 0
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Startup time of the cron commands compared to a baseline')
+    parser.add_argument('--baseline-ref', help='git ref to compare against, measured now from a temporary worktree')
+    parser.add_argument('--update', action='store_true', help='save these timings as this machine\'s baseline file')
+    args = parser.parse_args()
+    server = fake_lichess.start(fake_lichess.FakeLichess('x', []))
+    env = dict(os.environ, LICHESS_BASE_URL=f'http://127.0.0.1:{server.server_address[1]}')
+    try:
+        if args.baseline_ref:
+            return compare_ref(args.baseline_ref, env)
+        return compare_file(args.update, env)
+    finally:
+        server.shutdown()
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,28 @@
+"""
+Packages litourney into a single file zipapp with precompiled bytecode: python tools/build_zipapp.py [output]
+The third party requirements (requirements.txt) still need to be installed where it runs
+"""
+import compileall
+import os
+import shutil
+import sys
+import tempfile
+import zipapp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGES = ['models', 'util']
+
+def build(output: str):
+    with tempfile.TemporaryDirectory() as staging:
+        for package in PACKAGES:
+            shutil.copytree(os.path.join(ROOT, package), os.path.join(staging, package), ignore=shutil.ignore_patterns('__pycache__'))
+        shutil.copy(os.path.join(ROOT, 'litourney.py'), os.path.join(staging, 'litourney.py'))
+        with open(os.path.join(staging, '__main__.py'), 'w') as main:
+            main.write('import runpy\nrunpy.run_module("litourney", run_name="__main__")\n')
+        # zipimport can't read __pycache__, so the bytecode has to sit next to the sources (legacy layout)
+        compileall.compile_dir(staging, quiet=1, legacy=True, optimize=0)
+        zipapp.create_archive(staging, output, interpreter='/usr/bin/env python3', compressed=True)
+    print(f'built {output}')
+
+if __name__ == '__main__':
+    build(sys.argv[1] if len(sys.argv) > 1 else os.path.join(ROOT, 'litourney.pyz'))
@@ -0,0 +1,171 @@
+"""
+Local stand-in for the parts of the lichess API this tool uses, for load testing without touching lichess.org
+    python tools/fake_lichess.py --port 8080 --latency 50 --rate-limit 60
+then run the tool with LICHESS_BASE_URL=http://127.0.0.1:8080
+GET /_stats returns request counts per endpoint
+"""
+import argparse
+from collections import Counter, deque
+from datetime import datetime, timezone
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import random
+import string
+import threading
+import time
+from urllib.parse import parse_qs, urlparse
+
+class FakeLichess:
+    def __init__(self, username: str = 'fake', teams: list = None, latency_ms: float = 0, rate_limit: int = 0, window_seconds: float = 60):
+        self.username = username
+        self.teams = teams or ['fake-team-1', 'fake-team-2']
+        self.latency = latency_ms / 1000
+        self.rate_limit = rate_limit # requests per window per endpoint, 0 = unlimited
+        self.window = window_seconds
+        self.tournaments = {}
+        self.created_order = []
+        self.stats = Counter()
+        self.recent = {}
+        self.lock = threading.Lock()
+
+    def limited(self, endpoint: str) -> float:
+        # sliding window per endpoint, returns seconds to wait or 0
+        if not self.rate_limit: return 0
+        now = time.monotonic()
+        with self.lock:
+            hits = self.recent.setdefault(endpoint, deque())
+            while hits and hits[0] <= now - self.window:
+                hits.popleft()
+            if len(hits) >= self.rate_limit:
+                self.stats['429'] += 1
+                return hits[0] + self.window - now
+            hits.append(now)
+            return 0
+
+    def create(self, body: dict, team_id: str = None) -> dict:
+        id = ''.join(random.choices(string.ascii_letters + string.digits, k=8))
+        name = body.get('name') or random.choice(['Carlsen', 'Tal', 'Polgar', 'Fischer'])
+        starts_at = int(body.get('startDate') or time.time() * 1000)
+        tournament = {
+            'id': id,
+            'createdBy': self.username,
+            'fullName': name if team_id else f'{name} Arena',
+            'startsAt': starts_at,
+            'minutes': int(body.get('minutes', 60)),
+            'clock': {'limit': int(float(body.get('clockTime', 3)) * 60), 'increment': int(body.get('clockIncrement', 0))},
+            'variant': {'key': body.get('variant', 'standard')},
+            'status': 10,
+        }
+        with self.lock:
+            self.tournaments[id] = tournament
+            self.created_order.append(id)
+        return tournament
+
+    def created(self) -> list:
+        with self.lock:
+            tournaments = [self.tournaments[id] for id in self.created_order]
+        # lichess lists the latest starting first
+        return sorted(tournaments, key=lambda t: t['startsAt'], reverse=True)
+
+def make_handler(fake: FakeLichess):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+        # headers and body in one segment, otherwise delayed ACKs add ~40ms to every keep-alive request
+        wbufsize = 1 << 16
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def reply(self, status: int, body, content_type: str = 'application/json', headers: dict = None):
+            data = (body if isinstance(body, str) else json.dumps(body)).encode()
+            self.send_response(status)
+            self.send_header('Content-Type', content_type)
+            self.send_header('Content-Length', str(len(data)))
+            for (key, value) in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(data)
+
+        def handle_request(self, method: str):
+            url = urlparse(self.path)
+            parts = [p for p in url.path.split('/') if p]
+            endpoint = endpoint_name(method, parts)
+            fake.stats[endpoint] += 1
+            length = int(self.headers.get('Content-Length') or 0)
+            body = json.loads(self.rfile.read(length) or b'{}') if length else {}
+            if endpoint == 'stats':
+                return self.reply(200, dict(fake.stats))
+            if fake.latency:
+                time.sleep(fake.latency)
+            wait = fake.limited(endpoint)
+            if wait:
+                return self.reply(429, {'error': 'Too many requests'}, headers={'Retry-After': str(max(1, round(wait)))})
+            self.route(endpoint, parts, parse_qs(url.query), body)
+
+        def route(self, endpoint: str, parts: list, query: dict, body: dict):
+            if endpoint == 'account':
+                return self.reply(200, {'id': fake.username.lower(), 'username': fake.username})
+            if endpoint == 'teams':
+                teams = [{'id': team, 'name': team, 'leaders': [{'name': fake.username}]} for team in fake.teams]
+                etag = f'"{hashlib.md5(json.dumps(teams).encode()).hexdigest()}"'
+                if self.headers.get('If-None-Match') == etag:
+                    return self.reply(304, '', headers={'ETag': etag})
+                return self.reply(200, teams, headers={'ETag': etag})
+            if endpoint == 'created':
+                status = query.get('status', [None])[0]
+                tournaments = [t for t in fake.created() if status is None or str(t['status']) == status]
+                return self.reply(200, '\n'.join(json.dumps(t) for t in tournaments), 'application/x-ndjson')
+            if endpoint in ('arena', 'swiss'):
+                return self.reply(200, fake.create(body, parts[-1] if endpoint == 'swiss' else None))
+            if endpoint == 'team-battle':
+                return self.reply(200, fake.tournaments.get(parts[-1], {}))
+            if endpoint == 'pm':
+                return self.reply(200, {'ok': True})
+            if endpoint == 'results':
+                return self.reply(200, {'rank': 1, 'score': 20, 'rating': 2000, 'username': 'FakeWinner'}, 'application/x-ndjson')
+            if endpoint == 'tournament':
+                tournament = fake.tournaments.get(parts[-1])
+                finished = tournament is None or tournament['startsAt'] / 1000 < time.time()
+                return self.reply(200, {**(tournament or {'id': parts[-1]}), 'isFinished': finished})
+            self.reply(404, {'error': 'Not found'})
+
+        def do_GET(self):
+            self.handle_request('GET')
+
+        def do_POST(self):
+            self.handle_request('POST')
+    return Handler
+
+def endpoint_name(method: str, parts: list) -> str:
+    path = '/'.join(parts)
+    if path == '_stats': return 'stats'
+    if path == 'api/account': return 'account'
+    if path.startswith('api/team/of/'): return 'teams'
+    if path.startswith('api/user/') and path.endswith('/tournament/created'): return 'created'
+    if path == 'api/tournament' and method == 'POST': return 'arena'
+    if path.startswith('api/swiss/new/'): return 'swiss'
+    if path.startswith('api/tournament/team-battle/'): return 'team-battle'
+    if path.startswith('team/') and path.endswith('/pm-all'): return 'pm'
+    if path.startswith('api/tournament/') and path.endswith('/results'): return 'results'
+    if path.startswith('api/tournament/'): return 'tournament'
+    return 'unknown'
+
+def start(fake: FakeLichess, port: int = 0) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', port), make_handler(fake))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local fake lichess server')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--username', default='fake')
+    parser.add_argument('--latency', type=float, default=0, help='added latency per request in ms')
+    parser.add_argument('--rate-limit', type=int, default=0, help='requests allowed per endpoint per window before 429s (0 = unlimited)')
+    parser.add_argument('--window', type=float, default=60, help='rate limit window in seconds')
+    args = parser.parse_args()
+    fake = FakeLichess(args.username, latency_ms=args.latency, rate_limit=args.rate_limit, window_seconds=args.window)
+    server = ThreadingHTTPServer(('127.0.0.1', args.port), make_handler(fake))
+    print(f'fake lichess listening on http://127.0.0.1:{args.port} ({datetime.now(timezone.utc).isoformat()})')
+    server.serve_forever()
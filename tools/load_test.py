@@ -0,0 +1,66 @@
+"""
+Load test against the local fake lichess server: python tools/load_test.py --configs 10000 --runs 3
+Each run does what a scheduled create + notify would do, and reports runs/sec and API calls per tournament
+"""
+import argparse
+import contextlib
+from datetime import datetime, timezone
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'tools'))
+import fake_lichess
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test create/notify against tools/fake_lichess.py')
+    parser.add_argument('--configs', type=int, default=10000)
+    parser.add_argument('--runs', type=int, default=3)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--latency', type=float, default=20, help='fake server latency per request in ms')
+    parser.add_argument('--server-rate-limit', type=int, default=0, help='fake server requests per endpoint per window (0 = unlimited)')
+    parser.add_argument('--client-rate', type=float, default=1000, help='client token bucket rate per endpoint class, per second')
+    args = parser.parse_args()
+
+    fake = fake_lichess.FakeLichess('loadtest', ['club-a', 'club-b', 'club-c'], args.latency, args.server_rate_limit, 10)
+    server = fake_lichess.start(fake)
+    os.environ['LICHESS_BASE_URL'] = f'http://127.0.0.1:{server.server_address[1]}'
+
+    # imported after LICHESS_BASE_URL is set
+    import util.automation as automation
+    import util.lichess_api as lichess
+    from models.config import Config, load_config
+    from models.Tournament import load_tournaments, save_tournaments
+    from models.UserInfo import UserInfo, load_user_info
+    from synthetic import synthetic_tournaments
+    from util.rate_limiter import EndpointClass
+
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        Config('loadtest-token', 7, args.concurrency, {kind.value: [args.client_rate, max(1, int(args.client_rate))] for kind in EndpointClass}).save()
+        UserInfo(fake.username, fake.teams).save()
+        save_tournaments(synthetic_tournaments(args.configs, datetime.now(timezone.utc), fake.teams))
+        runs = []
+        for run in range(args.runs):
+            calls_before = sum(v for (k, v) in fake.stats.items() if k not in ('stats', '429'))
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                config, user = load_config(), load_user_info()
+                automation.create_due(config, user, load_tournaments(), config.concurrency)
+                automation.notify_due(config, user, load_tournaments())
+            seconds = time.perf_counter() - start
+            calls = sum(v for (k, v) in fake.stats.items() if k not in ('stats', '429')) - calls_before
+            runs.append({'run': run + 1, 'seconds': round(seconds, 3), 'api_calls': calls, 'calls_per_tournament': round(calls / args.configs, 4)})
+            print(f'run {run + 1}: {seconds:.2f}s, {calls} api calls ({calls / args.configs:.3f} per tournament)')
+        total = sum(r['seconds'] for r in runs)
+        print(f'{len(runs) / total:.3f} runs/sec over {len(runs)} runs, {len(fake.created_order)} tournaments created, {fake.stats["429"]} rate limited')
+        print(json.dumps({'endpoints': {k: v for (k, v) in fake.stats.items() if k != 'stats'}, 'runs': runs}, indent=4))
+    server.shutdown()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,41 @@
+"""
+Synthetic tournament configs for load tests and benchmarks, covering every type, recurrence type and variant
+"""
+from datetime import datetime, timedelta
+import random
+from typing import List
+from models.RecurrenceType import RecurrenceType
+from models.Tournament import Tournament
+from models.TournamentType import TournamentType
+from models.lichess.ClockIncrement import ClockIncrement
+from models.lichess.ClockTime import ClockTime
+from models.lichess.GamesRestriction import GamesRestriction
+from models.lichess.RatingRestriction import RatingRestriction
+from models.lichess.TournamentLength import TournamentLength
+from models.lichess.Variant import Variant
+
+STARTING_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+CLOCKS = [(ClockTime.MINUTES_1, ClockIncrement.SECONDS_0), (ClockTime.MINUTES_3, ClockIncrement.SECONDS_2),
+          (ClockTime.MINUTES_5, ClockIncrement.SECONDS_3), (ClockTime.MINUTES_10, ClockIncrement.SECONDS_5)]
+TEMPLATE = '[name] starts soon![br][variant] [clocktime]+[clockincrement] [link][br][timezone:Europe/London] / [timezone:America/New_York]'
+
+def synthetic_tournaments(count: int, now: datetime, teams: List[str], seed: int = 1) -> List[Tournament]:
+    rng = random.Random(seed)
+    recurrences, variants = list(RecurrenceType), list(Variant)
+    tournaments = []
+    for i in range(count):
+        type = [TournamentType.Arena, TournamentType.Arena, TournamentType.Swiss, TournamentType.TeamBattle][i % 4]
+        clock_time, clock_increment = CLOCKS[i % len(CLOCKS)]
+        variant = variants[i % len(variants)]
+        team = teams[i % len(teams)]
+        team_restriction = ','.join(teams[:2]) if type == TournamentType.TeamBattle else team
+        # spread first dates a few weeks either side of now, on whole minutes like the new command produces
+        first_date = (now + timedelta(minutes=rng.randrange(-40 * 24 * 60, 20 * 24 * 60))).replace(second=0, microsecond=0)
+        name = f'Series {i}' if i % 5 else f'Series {i} [winner]'
+        tournaments.append(Tournament(type, name, clock_time, clock_increment, TournamentLength.MINUTES_90,
+                                      recurrences[i % len(recurrences)], first_date, variant, True,
+                                      STARTING_FEN if variant == Variant.FROM_POSITION else None,
+                                      True, True, True, f'synthetic {i}', team_restriction,
+                                      RatingRestriction.NONE, RatingRestriction.NONE, GamesRestriction.NONE,
+                                      TEMPLATE, None, None, 1 if type == TournamentType.TeamBattle else 0))
+    return tournaments
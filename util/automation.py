@@ -0,0 +1,267 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta, timezone
+from enum import StrEnum
+import os
+from typing import Callable, Dict, List, Tuple
+from models.CreatedIndex import CreatedIndex
+from models.CreatedStore import CreatedStore, load_created_store
+from models.IntentLog import CONFIRMED, PLANNED, POSTED, clear_intents, record_intents, unfinished_intents
+from models.ResultsCache import load_results_cache
+from models.StateJournal import append_state
+from models.Templating import NameReplacement
+from models.TeamDigest import plan_digests
+from models.Timeline import Timeline
+from models.Tournament import Tournament, load_tournaments
+from models.Validation import validate_all
+from models.UserInfo import UserInfo, load_user_info
+from models.config import Config, load_config
+from models.lichess.TournamentResponse import TournamentResponse
+import util.constants as constants
+from util.funi import success
+import util.lichess_api as lichess
+import util.metrics as metrics
+
+NOTIFY_WINDOW = timedelta(days=1) # reminders go out once (starts_at - now).days == 0
+
+class AccountCommand(StrEnum):
+    create = 'create'
+    notify = 'notify'
+    run = 'run'
+    refresh = 'refresh'
+
+def main(args: List[str]) -> bool:
+    """
+    Lightweight entry for the non-interactive commands, returns False for anything it doesn't handle so typer can
+    """
+    if len(args) == 0:
+        return False
+    command, options = args[0], args[1:]
+    if command in ('create', 'run'):
+        concurrency = parse_concurrency(options)
+        if concurrency is False:
+            return False
+        with metrics.phase('load'):
+            config, tourneys = load_config(), load_tournaments()
+            user = current_user(config)
+        (create_due if command == 'create' else run_due)(config, user, tourneys, concurrency or config.concurrency)
+        return True
+    if command == 'notify' and len(options) == 0:
+        with metrics.phase('load'):
+            config, tourneys = load_config(), load_tournaments()
+            user = current_user(config)
+        notify_due(config, user, tourneys)
+        return True
+    return False
+
+def parse_concurrency(options: List[str]):
+    if len(options) == 0:
+        return None
+    if len(options) == 1 and options[0].startswith('--concurrency='):
+        value = options[0].split('=', 1)[1]
+    elif len(options) == 2 and options[0] == '--concurrency':
+        value = options[1]
+    else:
+        return False
+    return int(value) if value.isdigit() else False
+
+def create_due(config: Config, user: UserInfo, tourneys: List[Tournament], workers: int):
+    lichess.set_rate_limits(config.api_key, config.rate_limits)
+    lichess.set_pool_size(workers)
+    timeline = Timeline(tourneys, config.horizon())
+    store = sync_store(config, user, timeline)
+    create_pending(config, user, tourneys, workers, timeline, store)
+    store.save()
+
+def notify_due(config: Config, user: UserInfo, tourneys: List[Tournament]):
+    lichess.set_rate_limits(config.api_key, config.rate_limits)
+    timeline = Timeline(tourneys, NOTIFY_WINDOW)
+    to_notify = due_notifications(timeline)
+    # most runs have nothing due, and what is due is usually already in the local store
+    store = sync_store(config, user, timeline, lambda store: all_created(store, to_notify))
+    store.save()
+    send_notifications(config, to_notify, timeline, store)
+
+def run_due(config: Config, user: UserInfo, tourneys: List[Tournament], workers: int):
+    """
+    create then notify sharing one timeline and one sync of the created list, tournaments created here
+    go straight into the store so the notification phase sees them without asking lichess again
+    """
+    lichess.set_rate_limits(config.api_key, config.rate_limits)
+    lichess.set_pool_size(workers)
+    timeline = Timeline(tourneys, max(config.horizon(), NOTIFY_WINDOW))
+    store = sync_store(config, user, timeline)
+    create_pending(config, user, tourneys, workers, timeline, store)
+    send_notifications(config, due_notifications(timeline), timeline, store)
+    store.save()
+
+def sync_store(config: Config, user: UserInfo, timeline: Timeline, complete: Callable[[CreatedStore], bool] = None) -> CreatedStore:
+    store = load_created_store()
+    with metrics.phase('fetch_created'):
+        return lichess.sync_created(config.api_key, user.username, store, timeline.now, complete)
+
+def create_pending(config: Config, user: UserInfo, tourneys: List[Tournament], workers: int, timeline: Timeline, store: CreatedStore):
+    workers = max(1, workers)
+    resume_in_flight(config, user, timeline, store)
+    existing = CreatedIndex(store.upcoming())
+    reattach(existing, tourneys, timeline)
+    with metrics.phase('select_due'):
+        to_create = missing_occurrences(tourneys, timeline, existing, timeline.now + config.horizon())
+    if len(to_create) == 0:
+        clear_intents()
+        success('nothing to create')
+        return
+    with metrics.phase('prefetch_winners'):
+        results = load_results_cache()
+        winners = lichess.prefetch_winners(config.api_key, [t for (t, _) in to_create], results, workers)
+        results.save()
+    clear_intents()
+    record_intents(PLANNED, [(t, t.fingerprint(starts_at), None) for (t, starts_at) in to_create])
+    # last_id follows the latest occurrence created, earlier ones are found by fingerprint
+    latest = {t.uid: existing.find(t).starts_at for (t, _) in to_create if existing.find(t) is not None}
+    with metrics.phase('create', count=len(to_create)), ThreadPoolExecutor(max_workers=workers) as pool:
+        pending = {pool.submit(post_tournament, config.api_key, tourney, starts_at, winners.get(tourney.last_id)): (tourney, starts_at) for (tourney, starts_at) in to_create}
+        try:
+            for future in as_completed(pending):
+                (tourney, starts_at) = pending[future]
+                created = future.result()
+                if latest.get(tourney.uid) is None or starts_at > latest[tourney.uid]:
+                    latest[tourney.uid] = starts_at
+                    tourney.last_id = created.id
+                    append_state(tourney, last_id=created.id)
+                record_intents(CONFIRMED, [(tourney, tourney.fingerprint(starts_at), created.id)])
+                store.add(created)
+                success(f'{created.full_name} created')
+        except BaseException:
+            # drop the posts still queued, the ones in flight finish and are resumed from the intent log next run
+            pool.shutdown(wait=True, cancel_futures=True)
+            raise
+    clear_intents()
+
+def missing_occurrences(tourneys: List[Tournament], timeline: Timeline, existing: CreatedIndex, end: datetime) -> List[Tuple[Tournament, datetime]]:
+    """
+    Occurrences of valid tournaments starting before end that haven't been created yet. Names using the previous
+    winner only get their next occurrence, the name isn't known further ahead than that
+    """
+    valid = {t.uid for (t, failed) in zip(tourneys, validate_all(tourneys)) if not failed}
+    claimed = {t.last_id for t in tourneys if existing.find(t) is not None}
+    missing = []
+    for (starts_at, tourney) in timeline.between(timeline.now, end):
+        if tourney.uid not in valid: continue
+        if NameReplacement.WINNER.value in tourney.name and starts_at != timeline.next_date(tourney): continue
+        created = existing.find_occurrence(tourney, starts_at, claimed)
+        if created is None:
+            missing.append((tourney, starts_at))
+        else:
+            claimed.add(created.id)
+    return missing
+
+def post_tournament(api_key: str, tourney: Tournament, starts_at: datetime, previous_winner: str) -> TournamentResponse:
+    record_intents(POSTED, [(tourney, tourney.fingerprint(starts_at), None)])
+    return lichess.create_tournament(api_key, tourney, starts_at, previous_winner)
+
+def resume_in_flight(config: Config, user: UserInfo, timeline: Timeline, store: CreatedStore):
+    """
+    Creates sent by a run that crashed before saving their ids may exist on lichess already. Reads the created list
+    only down to the earliest of their start times, so they are matched by fingerprint instead of posted again
+    """
+    starts = [datetime.fromtimestamp(intent['fingerprint'][0], timezone.utc) for intent in unfinished_intents()]
+    starts = [s for s in starts if s > timeline.now]
+    if len(starts) == 0:
+        return
+    with metrics.phase('resume', count=len(starts)):
+        store.merge(lichess.my_tournaments(config.api_key, user.username, not_before=min(starts)))
+
+def due_notifications(timeline: Timeline) -> List[Tuple[Tournament, datetime]]:
+    # only tournaments with an occurrence in the next day can need a reminder
+    upcoming = timeline.first_each(timeline.now, timeline.now + NOTIFY_WINDOW)
+    return [(t, starts_at) for (starts_at, t) in upcoming if t.needs_notification(starts_at, timeline.now)]
+
+def send_notifications(config: Config, to_notify: List[Tuple[Tournament, datetime]], timeline: Timeline, store: CreatedStore):
+    existing = CreatedIndex(store.upcoming())
+    matched = [(t, existing.find_occurrence(t, starts_at), starts_at) for (t, starts_at) in to_notify]
+    matched = [(t, created, starts_at) for (t, created, starts_at) in matched if created is not None]
+    if len(matched) == 0:
+        success('nothing to notify')
+        return
+    names = {t.uid: created.full_name for (t, created, _) in matched}
+    digests = plan_digests(matched)
+    with metrics.phase('notify', count=len(matched), messages=len(digests)):
+        for digest in digests:
+            lichess.pm_team(config.api_key, digest.team, digest.message())
+            for tourney in digest.tournaments:
+                tourney.last_notified = timeline.now
+                append_state(tourney, last_notified=timeline.now)
+            success(f'{digest.team} notified for {", ".join(names[t.uid] for t in digest.tournaments)}')
+
+def reattach(existing: CreatedIndex, tourneys: List[Tournament], timeline: Timeline):
+    reattached = existing.reattach_orphans(tourneys, timeline)
+    if len(reattached):
+        from rich.markup import escape
+        for tourney in reattached:
+            append_state(tourney, last_id=tourney.last_id)
+            success(escape(f'{tourney.name} was already created ({tourney.last_id}), reattached'))
+
+def all_created(store: CreatedStore, occurrences: List[Tuple[Tournament, datetime]]) -> bool:
+    # matched the same way send_notifications does, so the store only counts as complete if every PM would go out
+    existing = CreatedIndex(store.upcoming())
+    return all(existing.find_occurrence(t, starts_at) is not None for (t, starts_at) in occurrences)
+
+def refresh_user(config: Config, user: UserInfo = None) -> UserInfo:
+    """
+    Revalidates the teams you lead with a conditional request, the username is only fetched when there isn't one yet
+    """
+    lichess.set_rate_limits(config.api_key, config.rate_limits)
+    if user is None:
+        user = UserInfo(lichess.username(config.api_key), [])
+    (teams, validators) = lichess.teams(config.api_key, user.username, user.validators)
+    if teams is not None:
+        user.teams = teams
+    user.mark_checked(validators)
+    user.save()
+    return user
+
+def stored_user() -> UserInfo:
+    return load_user_info() if os.path.exists(constants.USER_INFO_FILENAME) else None
+
+def current_user(config: Config, user: UserInfo = None, revalidate: bool = False) -> UserInfo:
+    """
+    The stored user info, fetched from lichess only when there is none yet. Creating and notifying only need the
+    username, revalidate also refreshes the teams once they are older than their TTL (for picking teams in new / edit)
+    """
+    user = user or stored_user()
+    if user is None or (revalidate and user.is_stale()):
+        user = refresh_user(config, user)
+    return user
+
+def run_accounts(accounts: Dict[str, str], command: AccountCommand, workers: int) -> Dict[str, str]:
+    """
+    Runs a command for every account in a pool of worker processes, returns an error message (or None) per account.
+    Processes rather than threads: each account works from its own directory and gets its own session and rate limiter
+    """
+    if len(accounts) == 0:
+        return {}
+    # only the accounts commands need it, and it pulls in multiprocessing
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(max_workers=max(1, min(workers, len(accounts)))) as pool:
+        futures = {name: pool.submit(run_account, directory, command) for (name, directory) in accounts.items()}
+        return {name: future.result() for (name, future) in futures.items()}
+
+def run_account(directory: str, command: AccountCommand) -> str:
+    try:
+        os.chdir(directory)
+        config = load_config()
+        if command == AccountCommand.refresh:
+            refresh_user(config, stored_user())
+        elif command == AccountCommand.create:
+            create_due(config, current_user(config), load_tournaments(), config.concurrency)
+        elif command == AccountCommand.notify:
+            notify_due(config, current_user(config), load_tournaments())
+        elif command == AccountCommand.run:
+            run_due(config, current_user(config), load_tournaments(), config.concurrency)
+        return None
+    except SystemExit:
+        # the loaders and api helpers quit() after printing what went wrong
+        return 'failed, see output above'
+    except Exception as e:
+        return str(e)
+
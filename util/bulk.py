@@ -0,0 +1,142 @@
+"""
+Bulk import/export of tournament configs as CSV, JSONL or YAML. Input is read a record at a time and validated in
+batches, so large files never need to be held in memory as a whole
+"""
+import csv
+from datetime import datetime, timezone
+from enum import Enum, StrEnum
+import json
+import os
+import sys
+from typing import Iterable, Iterator, List, Tuple
+from models.Tournament import ENUM_FIELDS, Tournament, encode_tournament, tournament_json_decoder
+from models.Validation import MESSAGES, Rule, validate_all
+from util.funi import failure
+
+BATCH_SIZE = 1000
+BOOLEAN_FIELDS = ('rated', 'berserkable', 'streakable', 'has_chat')
+OPTIONAL_FIELDS = ('positionFEN', 'team_restriction', 'team_pm_template', 'last_notified', 'last_id', 'uid')
+DEFAULTS = {'description': '', 'positionFEN': None, 'team_restriction': None, 'team_pm_template': None,
+            'last_notified': None, 'last_id': None, 'num_leaders': 0, 'uid': None}
+TRUE_VALUES = ('true', 'yes', 'y', '1')
+FALSE_VALUES = ('false', 'no', 'n', '0')
+
+class Format(StrEnum):
+    CSV = 'csv'
+    JSONL = 'jsonl'
+    YAML = 'yaml'
+
+def detect_format(path: str, format: Format = None) -> Format:
+    if format is not None: return format
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    if extension in ('yml', 'yaml'): return Format.YAML
+    if extension in ('jsonl', 'ndjson', 'json'): return Format.JSONL
+    return Format.CSV
+
+def import_yaml():
+    try:
+        import yaml # optional, only needed for YAML files
+        return yaml
+    except ImportError:
+        failure('YAML files need PyYAML, install it with: pip install pyyaml')
+        quit()
+
+def read_records(stream, format: Format) -> Iterator[dict]:
+    if format == Format.CSV:
+        yield from csv.DictReader(stream)
+    elif format == Format.JSONL:
+        for line in stream:
+            if line.strip():
+                yield json.loads(line)
+    else:
+        # one tournament per document, or documents holding a list of them
+        for document in import_yaml().safe_load_all(stream):
+            if isinstance(document, list): yield from document
+            elif document is not None: yield document
+
+def coerce_record(record: dict) -> Tournament:
+    """
+    Turns a record from any of the formats into the shape tournament_json_decoder expects, then decodes it
+    """
+    data = {**DEFAULTS, **{key: value for (key, value) in record.items() if key in Tournament.__slots__}}
+    for key in OPTIONAL_FIELDS:
+        if data[key] == '': data[key] = None
+    for key in BOOLEAN_FIELDS:
+        data[key] = parse_bool(key, data.get(key))
+    for key in ENUM_FIELDS:
+        # csv gives strings already, yaml and json may give numbers
+        if data.get(key) is not None and not isinstance(data[key], str): data[key] = str(data[key])
+    for key in ('first_date_utc', 'last_notified'):
+        if isinstance(data.get(key), datetime): data[key] = data[key].isoformat()
+    data['num_leaders'] = int(data['num_leaders'] or 0)
+    data['name'] = data.get('name') or ''
+    tournament = tournament_json_decoder(data)
+    if tournament.first_date_utc.tzinfo is None:
+        tournament.first_date_utc = tournament.first_date_utc.replace(tzinfo=timezone.utc)
+    return tournament
+
+def parse_bool(key: str, value) -> bool:
+    if isinstance(value, bool): return value
+    text = str(value).strip().lower()
+    if text in TRUE_VALUES: return True
+    if text in FALSE_VALUES: return False
+    raise ValueError(f'{key} should be true or false, not {value!r}')
+
+def failure_messages(failed: Rule) -> str:
+    return '; '.join(MESSAGES[rule] for rule in Rule if rule in failed)
+
+def import_records(records: Iterable[dict]) -> Iterator[Tuple[int, Tournament, str]]:
+    """
+    Yields (record number, tournament or None, error or None), validating a batch at a time
+    """
+    batch = []
+    for (number, record) in enumerate(records, start=1):
+        try:
+            batch.append((number, coerce_record(record)))
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            message = f'missing {e}' if isinstance(e, KeyError) else str(e)
+            yield (number, None, message)
+        if len(batch) == BATCH_SIZE:
+            yield from validate_batch(batch)
+            batch = []
+    yield from validate_batch(batch)
+
+def validate_batch(batch: List[Tuple[int, Tournament]]) -> Iterator[Tuple[int, Tournament, str]]:
+    for ((number, tournament), failed) in zip(batch, validate_all([t for (_, t) in batch])):
+        yield (number, None, failure_messages(failed)) if failed else (number, tournament, None)
+
+def merge(existing: List[Tournament], imported: List[Tournament]) -> Tuple[int, int]:
+    """
+    Imported configs with the uid of an existing one replace it, the rest are added. Returns (added, updated)
+    """
+    positions = {t.uid: i for (i, t) in enumerate(existing)}
+    added = updated = 0
+    for tournament in imported:
+        position = positions.get(tournament.uid)
+        if position is None:
+            positions[tournament.uid] = len(existing)
+            existing.append(tournament)
+            added += 1
+        else:
+            existing[position] = tournament
+            updated += 1
+    return (added, updated)
+
+def plain_record(tournament: Tournament) -> dict:
+    # enum members as their plain values, yaml can't represent str subclasses
+    return {key: value.value if isinstance(value, Enum) else value for (key, value) in encode_tournament(tournament).items()}
+
+def write_records(stream, tourneys: Iterable[Tournament], format: Format):
+    if format == Format.CSV:
+        writer = csv.DictWriter(stream, fieldnames=Tournament.__slots__)
+        writer.writeheader()
+        for tournament in tourneys:
+            writer.writerow(plain_record(tournament))
+    elif format == Format.JSONL:
+        for tournament in tourneys:
+            stream.write(json.dumps(plain_record(tournament)) + '\n')
+    else:
+        import_yaml().safe_dump_all((plain_record(t) for t in tourneys), stream, sort_keys=False, allow_unicode=True)
+
+def open_output(path: str):
+    return sys.stdout if path == '-' else open(path, 'w', newline='', encoding='utf-8')
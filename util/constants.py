@@ -1,3 +1,9 @@
 CONFIG_FILENAME = "config.json"
 USER_INFO_FILENAME = "user-info.json"
-TOURNAMENTS_FILENAME = "tournaments.json"
\ No newline at end of file
+TOURNAMENTS_FILENAME = "tournaments.json"
+SCHEDULER_STATUS_FILENAME = "scheduler-status.json"
+STATE_JOURNAL_FILENAME = "tournament-state.jsonl"
+RESULTS_CACHE_FILENAME = "results-cache.json"
+ACCOUNTS_FILENAME = "accounts.json"
+CREATED_STORE_FILENAME = "created-tournaments.json"
+CREATE_INTENTS_FILENAME = "create-intents.jsonl"
\ No newline at end of file
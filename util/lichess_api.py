@@ -1,45 +1,106 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 import json
-from typing import List
-import requests
+import os
+import re
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Set, Tuple
 from models.Templating import NameReplacement
+from models.CreatedStore import CreatedStore
+from models.ResultsCache import ResultsCache
 from models.Tournament import Tournament
 from models.TournamentType import TournamentType
 from models.lichess.GamesRestriction import GamesRestriction
 from models.lichess.RatingRestriction import RatingRestriction
 from models.lichess.TournamentResponse import TournamentResponse
 from models.lichess.Variant import Variant
-from util.funi import failure, wait
+from util.funi import failure
+import util.metrics as metrics
+from util.rate_limiter import MAX_RETRIES, EndpointClass, RateLimiter, configured_rates
 
-BASE_URL = 'https://lichess.org'
+BASE_URL = os.environ.get('LICHESS_BASE_URL', 'https://lichess.org').rstrip('/') # override to point at tools/fake_lichess.py
+DEFAULT_POOL_SIZE = 10
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+_pool_size = DEFAULT_POOL_SIZE
+_limiters = {} # api_key -> (rate_limits, RateLimiter)
+_limiters_lock = threading.Lock()
+ENDPOINT_LABELS = [
+    (re.compile(r'^/api/account$'), 'account'),
+    (re.compile(r'^/api/team/of/[^/]+$'), 'team_of'),
+    (re.compile(r'^/api/user/[^/]+/tournament/created$'), 'tournaments_created'),
+    (re.compile(r'^/api/tournament$'), 'create_arena'),
+    (re.compile(r'^/api/swiss/new/[^/]+$'), 'create_swiss'),
+    (re.compile(r'^/api/tournament/team-battle/[^/]+$'), 'team_battle'),
+    (re.compile(r'^/team/[^/]+/pm-all$'), 'pm_all'),
+    (re.compile(r'^/api/tournament/[^/]+/results$'), 'results'),
+    (re.compile(r'^/api/tournament/[^/]+$'), 'tournament'),
+]
 
 def username(api_key: str) -> str:
     url = f'{BASE_URL}/api/account'
     profile = json.loads(rate_limited_get(url, api_key))
     return profile['username']
 
-def teams(api_key: str, username: str) -> List[str]:
+def teams(api_key: str, username: str, validators: dict = None) -> Tuple[List[str], dict]:
+    """
+    Teams the user leads and the validators to send next time. Teams is None when lichess says nothing has changed
+    """
     url = f'{BASE_URL}/api/team/of/{username}'
-    teams_data = json.loads(rate_limited_get(url, api_key))
-    return [team['id'] for team in teams_data if is_leader(username, team)]
+    (text, validators) = rate_limited_conditional_get(url, api_key, validators)
+    if text is None:
+        return (None, validators)
+    return ([team['id'] for team in json.loads(text) if is_leader(username, team)], validators)
 
-def my_tournaments(api_key: str, username: str) -> List[TournamentResponse]:
+def my_tournaments(api_key: str, username: str, wanted_ids: Set[str] = None, not_before: datetime = None, after: datetime = None) -> List[TournamentResponse]:
+    # results come newest start date first, so reading can stop early once every wanted id
+    # has been seen, or once tournaments start before the window (or after the cursor) we care about
+    if wanted_ids is not None and len(wanted_ids) == 0: return []
     url = f'{BASE_URL}/api/user/{username}/tournament/created?status=10'
-    created = rate_limited_get(url, api_key).strip()
-    if len(created) == 0: return []
-    return [parse_created_tournament(json.loads(t)) for t in created.split('\n')]
+    remaining = None if wanted_ids is None else set(wanted_ids)
+    found = []
+    for line in rate_limited_stream(url, api_key):
+        created = parse_created_tournament(json.loads(line))
+        if not_before and created.starts_at and created.starts_at < not_before:
+            break
+        if after and created.starts_at and created.starts_at <= after:
+            break
+        found.append(created)
+        if remaining is not None:
+            remaining.discard(created.id)
+            if len(remaining) == 0:
+                break
+    return found
+
+def sync_created(api_key: str, username: str, store: CreatedStore, now: datetime, complete: Callable[[CreatedStore], bool] = None) -> CreatedStore:
+    """
+    Brings the local store of created tournaments up to date. Only tournaments starting after the cursor are read,
+    unless a full sync is due or the store still isn't complete. Nothing is read when it is complete already
+    """
+    store.prune(now)
+    if complete is not None and complete(store):
+        return store
+    if not store.needs_full_sync(now):
+        store.merge(my_tournaments(api_key, username, not_before=now, after=store.cursor))
+        if complete is None or complete(store):
+            return store
+    store.replace(my_tournaments(api_key, username, not_before=now), now)
+    return store
 
-def create_tournament(api_key: str, tournament: Tournament) -> TournamentResponse:
+def create_tournament(api_key: str, tournament: Tournament, starts_at: datetime = None, previous_winner: str = None) -> TournamentResponse:
     teams = tournament.team_restriction.split(',')
     url = get_new_tournament_url(tournament.type, teams[0])
     name = tournament.get_name('')
-    if tournament.last_id and NameReplacement.WINNER.value in tournament.name:
-        prev_winner = tournament_winner(api_key, tournament.last_id)
+    if needs_previous_winner(tournament):
+        prev_winner = previous_winner if previous_winner is not None else tournament_winner(api_key, tournament.last_id)
         name = tournament.get_name(prev_winner)
     data = {
         'clockTime' : tournament.clock_time.float_val(),
         'clockIncrement': tournament.clock_increment.int_val(),
         'minutes': tournament.length_mins.int_val(),
-        'startDate': int(tournament.get_next_date().timestamp() * 1000),
+        'startDate': int((starts_at or tournament.get_next_date()).timestamp() * 1000),
         'variant': tournament.variant.value,
         'rated': tournament.rated,
         'berserkable': tournament.berserkable,
@@ -63,12 +124,12 @@ def create_tournament(api_key: str, tournament: Tournament) -> TournamentRespons
             conditions['teamMember.teamId'] = tournament.team_restriction
     if tournament.type == TournamentType.TeamBattle:
         data['teamBattleByTeam'] = tournament.team_restriction.split(',')[0]
-        response = rate_limited_post(url, api_key, data)
+        response = rate_limited_post(url, api_key, data, EndpointClass.CREATE)
         tournament_id = json.loads(response)['id']
         update_team_tournament(api_key, tournament_id, teams, tournament.num_leaders)
         return parse_created_tournament(json.loads(response))
     else:
-        response = rate_limited_post(url, api_key, data)
+        response = rate_limited_post(url, api_key, data, EndpointClass.CREATE)
         return parse_created_tournament(json.loads(response))
 
 def update_team_tournament(api_key: str, tournament_id: str, teams: List[str], num_leaders: int):
@@ -77,70 +138,179 @@ def update_team_tournament(api_key: str, tournament_id: str, teams: List[str], n
         'teams': ','.join(teams),
         'nbLeaders': num_leaders
     }
-    rate_limited_post(url, api_key, data)
+    rate_limited_post(url, api_key, data, EndpointClass.CREATE)
 
 def pm_team(api_key: str, team_id: str, message: str):
     url = f'{BASE_URL}/team/{team_id}/pm-all'
     data = {'message': message}
-    rate_limited_post(url, api_key, data)
+    rate_limited_post(url, api_key, data, EndpointClass.PM)
 
-def tournament_winner(api_key: str, tournament_id: str) -> str:
+def tournament_winner(api_key: str, tournament_id: str, cache: ResultsCache = None) -> str:
     if tournament_id is None: return ''
+    cached = cache.winner(tournament_id) if cache else None
+    if cached is not None: return cached
     url = f'{BASE_URL}/api/tournament/{tournament_id}/results?nb=1'
     results = rate_limited_try_get(url, api_key)
-    if results is None or len(results.strip()) == 0: return ''
-    return json.loads(results)['username']
+    winner = '' if results is None or len(results.strip()) == 0 else json.loads(results)['username']
+    # results of a running tournament are only the current leader, so only cache once it's over
+    if cache is not None and tournament_finished(api_key, tournament_id):
+        cache.store(tournament_id, winner)
+    return winner
+
+def tournament_finished(api_key: str, tournament_id: str) -> bool:
+    url = f'{BASE_URL}/api/tournament/{tournament_id}'
+    info = rate_limited_try_get(url, api_key)
+    return info is not None and json.loads(info).get('isFinished', False)
+
+def prefetch_winners(api_key: str, tournaments: List[Tournament], cache: ResultsCache, workers: int) -> Dict[str, str]:
+    """
+    Previous winners for every tournament whose name uses them, looked up at the same time before creation starts
+    """
+    ids = {t.last_id for t in tournaments if needs_previous_winner(t)}
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        return dict(zip(ids, pool.map(lambda id: tournament_winner(api_key, id, cache), ids)))
+
+def needs_previous_winner(tournament: Tournament) -> bool:
+    return bool(tournament.last_id) and NameReplacement.WINNER.value in tournament.name
 
 def get_headers(api_key: str) -> dict:
     return {'Authorization': f'Bearer {api_key}', 'Accept': 'application/json'}
 
-def rate_limited_get(url: str, api_key: str) -> str:
-    response = requests.get(url, headers=get_headers(api_key))
+def set_rate_limits(api_key: str, overrides: dict = None):
+    # the config's rate_limits, a token's limiter (and any back off it is in) is kept while they stay the same
+    with _limiters_lock:
+        current = _limiters.get(api_key)
+        if current is None or current[0] != overrides:
+            _limiters[api_key] = (overrides, RateLimiter(configured_rates(overrides)))
+
+def get_limiter(api_key: str) -> RateLimiter:
+    # lichess counts requests per token, so like the sessions there is one limiter per token
+    with _limiters_lock:
+        if api_key not in _limiters:
+            _limiters[api_key] = (None, RateLimiter())
+        return _limiters[api_key][1]
+
+def set_pool_size(size: int):
+    # sessions that are already open get a new adapter, so the pool always matches the latest size
+    global _pool_size
+    with _sessions_lock:
+        if max(1, size) == _pool_size: return
+        _pool_size = max(1, size)
+        for session in _sessions.values():
+            mount_adapter(session)
+
+def get_session(api_key: str) -> 'requests.Session':
+    # one keep-alive session per token, shared by every call (and thread) in the run
+    with _sessions_lock:
+        session = _sessions.get(api_key)
+        if session is None:
+            # imported here so runs that never touch the network (e.g. nothing to notify) don't pay for it
+            import requests
+            session = requests.Session()
+            session.headers.update(get_headers(api_key))
+            mount_adapter(session)
+            _sessions[api_key] = session
+        return session
+
+def mount_adapter(session: 'requests.Session'):
+    from requests.adapters import HTTPAdapter
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=_pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+def rate_limited_get(url: str, api_key: str, kind: EndpointClass = EndpointClass.READ) -> str:
+    response = request_with_retries('GET', url, api_key, kind)
     if response.ok:
         return response.text
-    elif response.status_code == 429:
-        failure('Request was rate limited, waiting for 1 min to retry')
-        wait(60)
-        return rate_limited_get(url, api_key)
-    else:
-        message = f'Web request failed: {response.status_code} - {response.reason}'
-        if response.status_code == 401: message = '401 Unauthorized - have you run setup with the correct API key?'
-        failure(message)
-        quit()
+    request_failed(response)
 
-def rate_limited_try_get(url: str, api_key: str) -> str:
-    response = requests.get(url, headers=get_headers(api_key))
+def rate_limited_conditional_get(url: str, api_key: str, validators: dict = None, kind: EndpointClass = EndpointClass.READ) -> Tuple[str, dict]:
+    """
+    GET with If-None-Match / If-Modified-Since from a previous response, returns (None, validators) on 304 Not Modified
+    """
+    validators = validators or {}
+    headers = {}
+    if validators.get('etag'): headers['If-None-Match'] = validators['etag']
+    if validators.get('last_modified'): headers['If-Modified-Since'] = validators['last_modified']
+    response = request_with_retries('GET', url, api_key, kind, headers=headers)
+    if response.status_code == 304:
+        return (None, validators)
     if response.ok:
-        return response.text
-    elif response.status_code == 429:
-        failure('Request was rate limited, waiting for 1 min to retry')
-        wait(60)
-        return rate_limited_try_get(url, api_key)
-    else:
-        return None
+        return (response.text, {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')})
+    request_failed(response)
+
+def rate_limited_stream(url: str, api_key: str, kind: EndpointClass = EndpointClass.READ) -> Iterable[str]:
+    headers = {'Accept': 'application/x-ndjson', 'Accept-Encoding': 'gzip'}
+    with request_with_retries('GET', url, api_key, kind, headers=headers, stream=True) as response:
+        if not response.ok:
+            request_failed(response)
+        endpoint = endpoint_label(url)
+        for line in response.iter_lines(decode_unicode=True):
+            metrics.inc('litourney_api_stream_bytes_total', len(line) + 1, endpoint=endpoint)
+            if line and line.strip():
+                yield line
+
+def rate_limited_try_get(url: str, api_key: str, kind: EndpointClass = EndpointClass.READ) -> str:
+    response = request_with_retries('GET', url, api_key, kind)
+    return response.text if response.ok else None
 
-def rate_limited_post(url: str, api_key: str, data: dict) -> str:
-    response = requests.post(url, headers=get_headers(api_key), json=data)
+def rate_limited_post(url: str, api_key: str, data: dict, kind: EndpointClass = EndpointClass.READ) -> str:
+    response = request_with_retries('POST', url, api_key, kind, json=data)
     if response.ok:
         return response.text
-    elif response.status_code == 429:
-        failure('Request was rate limited, waiting for 1 min to retry')
-        wait(60)
-        return rate_limited_post(url, api_key, data)
-    else:
-        message = f'Web request failed: {response.status_code} - {response.reason}'
-        if response.status_code == 401: message = '401 Unauthorized - have you run setup with the correct API key?'
-        failure(message)
-        quit()
+    request_failed(response)
+
+def request_with_retries(method: str, url: str, api_key: str, kind: EndpointClass, **kwargs) -> 'requests.Response':
+    endpoint = endpoint_label(url)
+    started = time.perf_counter()
+    waited = 0
+    limiter = get_limiter(api_key)
+    for attempt in range(MAX_RETRIES + 1):
+        wait_start = time.perf_counter()
+        limiter.acquire(kind)
+        waited += time.perf_counter() - wait_start
+        response = get_session(api_key).request(method, url, **kwargs)
+        backoff = limiter.observe(kind, response)
+        if response.status_code != 429 or attempt == MAX_RETRIES:
+            # streamed bodies aren't read yet, count them from the header when lichess sends one
+            size = int(response.headers.get('Content-Length') or 0) if kwargs.get('stream') else len(response.content)
+            metrics.record_request(endpoint, method, response.status_code, time.perf_counter() - started, size, attempt, waited)
+            return response
+        response.close()
+        failure(f'Request was rate limited ({kind}), retrying in {backoff:.0f}s')
+    return response
+
+def endpoint_label(url: str) -> str:
+    path = url[len(BASE_URL):].split('?')[0]
+    for (pattern, label) in ENDPOINT_LABELS:
+        if pattern.match(path):
+            return label
+    return 'other'
+
+def request_failed(response: 'requests.Response'):
+    message = f'Web request failed: {response.status_code} - {response.reason}'
+    if response.status_code == 401: message = '401 Unauthorized - have you run setup with the correct API key?'
+    if response.status_code == 429: message = f'Still rate limited after {MAX_RETRIES} retries, try again later'
+    failure(message)
+    quit()
 
 def parse_created_tournament(jsonObj) -> TournamentResponse:
     id = jsonObj['id']
-    full_name = jsonObj['fullName']
-    return TournamentResponse(id, full_name)
+    full_name = jsonObj.get('fullName', jsonObj.get('name'))
+    clock = jsonObj.get('clock') or {}
+    variant = jsonObj.get('variant')
+    if isinstance(variant, dict): variant = variant.get('key')
+    return TournamentResponse(id, full_name, parse_starts_at(jsonObj.get('startsAt')), clock.get('limit'), clock.get('increment'), variant, jsonObj.get('status'))
+
+def parse_starts_at(value) -> datetime:
+    # arenas give epoch milliseconds, swiss an ISO string
+    if value is None: return None
+    if isinstance(value, (int, float)):
+        return datetime.fromtimestamp(value / 1000, timezone.utc)
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
 
 def is_leader(username: str, teamJson) -> bool:
-    leaders = [leaderJson['name'] for leaderJson in teamJson['leaders']]
-    return username in leaders
+    return any(leaderJson['name'] == username for leaderJson in teamJson['leaders'])
 
 def get_new_tournament_url(type: TournamentType, team_id: str):
     match type:
@@ -0,0 +1,103 @@
+"""
+In-process metrics and trace spans for API calls and command phases.
+Exported when the process exits (and after every run under serve) if LITOURNEY_METRICS_FILE (Prometheus textfile format)
+and/or LITOURNEY_TRACE_FILE (one JSON span per line, OpenTelemetry-like fields) are set
+"""
+import atexit
+from contextlib import contextmanager
+import json
+import os
+import threading
+import time
+import uuid
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+METRICS_FILE = os.environ.get('LITOURNEY_METRICS_FILE')
+TRACE_FILE = os.environ.get('LITOURNEY_TRACE_FILE')
+
+_lock = threading.Lock()
+_counters = {} # (name, labels) -> value
+_histograms = {} # (name, labels) -> [bucket counts..., sum, count]
+_spans = []
+_trace_id = uuid.uuid4().hex
+
+def inc(name: str, value: float = 1, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+def observe(name: str, seconds: float, **labels):
+    key = (name, tuple(sorted(labels.items())))
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = [0] * (len(LATENCY_BUCKETS) + 2)
+        for (i, bound) in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                histogram[i] += 1
+        histogram[-2] += seconds
+        histogram[-1] += 1
+
+def record_request(endpoint: str, method: str, status: int, seconds: float, size: int, retries: int, wait_seconds: float):
+    inc('litourney_api_requests_total', endpoint=endpoint, method=method, status=str(status))
+    inc('litourney_api_response_bytes_total', size, endpoint=endpoint)
+    observe('litourney_api_request_seconds', seconds, endpoint=endpoint)
+    if retries:
+        inc('litourney_api_retries_total', retries, endpoint=endpoint)
+    if wait_seconds:
+        inc('litourney_api_rate_limit_wait_seconds_total', wait_seconds, endpoint=endpoint)
+    add_span(f'{method} {endpoint}', seconds, endpoint=endpoint, status=status, bytes=size, retries=retries, wait_seconds=round(wait_seconds, 3))
+
+def add_span(name: str, seconds: float, **attributes):
+    # only kept for the trace file, and export drains them so a long-running serve doesn't pile them up
+    if not TRACE_FILE: return
+    end = time.time()
+    with _lock:
+        _spans.append({'trace_id': _trace_id, 'span_id': uuid.uuid4().hex[:16], 'name': name,
+                       'start_time': end - seconds, 'end_time': end, 'duration_ms': round(seconds * 1000, 3), 'attributes': attributes})
+
+@contextmanager
+def phase(name: str, **attributes):
+    """
+    Times a block of a command (loading files, fetching, creating, notifying, writing...)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        observe('litourney_phase_seconds', seconds, phase=name)
+        add_span(name, seconds, **attributes)
+
+def prometheus_text() -> str:
+    lines = []
+    with _lock:
+        for ((name, labels), value) in sorted(_counters.items()):
+            lines.append(f'{name}{format_labels(labels)} {value}')
+        for ((name, labels), histogram) in sorted(_histograms.items()):
+            for (i, bound) in enumerate(LATENCY_BUCKETS):
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", str(bound)),))} {histogram[i]}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {histogram[-1]}')
+            lines.append(f'{name}_sum{format_labels(labels)} {histogram[-2]}')
+            lines.append(f'{name}_count{format_labels(labels)} {histogram[-1]}')
+    return '\n'.join(lines) + '\n'
+
+def format_labels(labels: tuple) -> str:
+    if not labels: return ''
+    return '{' + ','.join(f'{key}="{value}"' for (key, value) in labels) + '}'
+
+def export():
+    if METRICS_FILE:
+        # write then rename so the node exporter never reads half a file
+        with open(f'{METRICS_FILE}.tmp', 'w') as metricsFile:
+            metricsFile.write(prometheus_text())
+        os.replace(f'{METRICS_FILE}.tmp', METRICS_FILE)
+    if TRACE_FILE:
+        with _lock:
+            spans, _spans[:] = list(_spans), []
+        with open(TRACE_FILE, 'a') as traceFile:
+            for span in spans:
+                traceFile.write(json.dumps(span) + '\n')
+
+if METRICS_FILE or TRACE_FILE:
+    atexit.register(export)
@@ -114,28 +114,28 @@ Template"""
 
 def edit_tournament_property_prompt(tournament: Tournament):
     # awful
-    type_mappings = {prop: type(tournament.__dict__[(prop)]) for prop in AwfulTournamentEnum if prop != 'exit'}
+    type_mappings = {prop: type(getattr(tournament, prop)) for prop in AwfulTournamentEnum if prop != 'exit'}
     prop = typer.prompt(f'Edit which property? (or exit)', type=AwfulTournamentEnum)
     if prop == 'exit':
         return False
     if prop == 'first_date_utc':
         start_date = typer.prompt('What is the first date and time the tournament should occur (in your local time)? e.g. 2020-12-24 23:59:59.\nDate and time', type=datetime, value_proc=lambda x: datetime.strptime(x, "%Y-%m-%d %H:%M:%S"))
         utc_date = start_date.astimezone(timezone.utc)
-        tournament.__dict__[prop] = utc_date
+        setattr(tournament, prop, utc_date)
     elif prop == 'team_restriction' and tournament.type != TournamentType.TeamBattle:
         user = load_user_info()
         team_list = '\n'.join(f'    {i+1}: {team}' for (i,team) in enumerate(user.teams))
         message = f'Pick a team to restrict the tourney to:\n    0: Unrestricted\n{team_list}\nTeam'
         id = typer.prompt(message, type=int)
         team = None if id == 0 else user.teams[id-1]
-        tournament.__dict__[prop] = team
+        setattr(tournament, prop, team)
     elif prop == 'team_restriction' and tournament.type == TournamentType.TeamBattle:
         user = load_user_info()
         team_list = '\n'.join(f'    {i+1}: {team}' for (i,team) in enumerate(user.teams))
         message = f'Pick which teams to restrict the tourney to (enter their numbers separated by commas):\n{team_list}\nTeams'
         ids_str = typer.prompt(message, type=str)
         teams = [user.teams[int(id) - 1] for id in ids_str.split(',')]
-        tournament.__dict__[prop] = ','.join(teams)
+        setattr(tournament, prop, ','.join(teams))
     else:
         prop_type = type_mappings[prop]
         hint = ''
@@ -145,6 +145,6 @@ def edit_tournament_property_prompt(tournament: Tournament):
         if prop_type is str:
             default = ''
         value = typer.prompt(f'Set value{hint}', type=type_mappings[prop], default=default)
-        tournament.__dict__[prop] = value
+        setattr(tournament, prop, value)
     return True
     
\ No newline at end of file
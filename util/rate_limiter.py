@@ -0,0 +1,117 @@
+from enum import StrEnum
+import threading
+import time
+
+DEFAULT_RETRY_SECONDS = 60 # lichess asks for a full minute when no Retry-After is given
+MAX_RETRIES = 5
+MAX_BACKOFF_SECONDS = 5 * DEFAULT_RETRY_SECONDS # whatever the headers say, an endpoint class is never blocked for longer
+EPOCH_SECONDS_FROM = 365 * 24 * 3600 # a reset this large is a unix time, not a number of seconds to wait
+
+class EndpointClass(StrEnum):
+    READ = 'read'
+    CREATE = 'create'
+    PM = 'pm'
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate # tokens per second
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # only the calling thread sleeps, so work for other endpoint classes carries on meanwhile
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.refill(now)
+                delay = self.blocked_until - now
+                if delay <= 0 and self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                if delay <= 0:
+                    delay = (1 - self.tokens) / self.rate
+            time.sleep(delay)
+
+    def refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def throttle(self, seconds: float):
+        with self.lock:
+            self.tokens = 0
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+DEFAULT_RATES = {
+    # (tokens per second, burst capacity)
+    EndpointClass.READ: (2, 8),
+    EndpointClass.CREATE: (0.5, 4),
+    EndpointClass.PM: (0.1, 2),
+}
+
+def configured_rates(overrides: dict = None) -> dict:
+    """
+    DEFAULT_RATES with the config's rate_limits on top, e.g. {"create": [1, 8]} for 1 per second in bursts of 8
+    """
+    rates = dict(DEFAULT_RATES)
+    for (kind, (rate, capacity)) in (overrides or {}).items():
+        if float(rate) <= 0 or int(capacity) < 1:
+            raise ValueError(f'rate limit for {kind} must be above 0 with a burst of at least 1')
+        rates[EndpointClass(kind)] = (float(rate), int(capacity))
+    return rates
+
+class RateLimiter:
+    def __init__(self, rates: dict = None):
+        rates = rates or DEFAULT_RATES
+        self.buckets = {kind: TokenBucket(rate=rate, capacity=capacity) for (kind, (rate, capacity)) in rates.items()}
+
+    def acquire(self, kind: EndpointClass):
+        self.buckets[kind].acquire()
+
+    def observe(self, kind: EndpointClass, response) -> float:
+        """
+        Updates the bucket from rate limit response headers, returns how long to back off for (0 if not limited)
+        """
+        bucket = self.buckets[kind]
+        remaining = response.headers.get('X-RateLimit-Remaining')
+        reset = response.headers.get('X-RateLimit-Reset')
+        (remaining, reset) = (header_number(remaining), reset_seconds(reset))
+        if response.status_code != 429:
+            if remaining is not None and reset is not None and remaining <= 0:
+                bucket.throttle(min(reset, MAX_BACKOFF_SECONDS))
+            return 0
+        backoff = retry_after_seconds(response.headers.get('Retry-After'))
+        if backoff is None:
+            backoff = reset
+        if backoff is None:
+            backoff = DEFAULT_RETRY_SECONDS
+        backoff = min(backoff, MAX_BACKOFF_SECONDS)
+        bucket.throttle(backoff)
+        return backoff
+
+def header_number(value: str) -> float:
+    # proxies and older lichess versions have sent blanks and floats here, anything unreadable is ignored
+    try:
+        return max(0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+def reset_seconds(value: str) -> float:
+    # X-RateLimit-Reset is seconds to wait on lichess, but some servers and proxies send the unix time of the reset
+    seconds = header_number(value)
+    if seconds is not None and seconds >= EPOCH_SECONDS_FROM:
+        return max(0, seconds - time.time())
+    return seconds
+
+def retry_after_seconds(value: str) -> float:
+    if not value: return None
+    try:
+        return max(0, float(value))
+    except ValueError:
+        from email.utils import parsedate_to_datetime
+        try:
+            return max(0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
@@ -0,0 +1,114 @@
+from datetime import datetime, timedelta, timezone
+import heapq
+import json
+import os
+import time
+from typing import Callable, List, Set
+from models.Templating import NameReplacement
+import util.constants as constants
+from util.funi import failure
+
+CREATE = 'create'
+NOTIFY = 'notify'
+MAX_SLEEP_SECONDS = 300 # wake up at least this often to pick up edited config files
+STATUS_QUEUE_LENGTH = 20
+RETRY_SECONDS = 300 # a create / notify run that failed is tried again this much later
+
+class DeadlineQueue:
+    """
+    Min-heap of upcoming create / notify deadlines, derived from each tournament's occurrences in the timeline
+    """
+    def __init__(self):
+        self.heap = []
+        self.timings = {}
+        self.retries = set()
+        self.mtimes = config_mtimes()
+
+    def rebuild(self, tourneys: List, timeline, handled: bool = False):
+        # anything at or before 'now' was just handled, so it next matters once its occurrence rolls over
+        now = timeline.now
+        horizon = timeline.end - timeline.now
+        self.heap = []
+        for tourney in tourneys:
+            next_date = timeline.next_date(tourney)
+            rollover = next_date + timedelta(seconds=1)
+            # create runs when the next occurrence past the horizon comes within it (and straight away
+            # if nothing has been handled yet), notify once (next - now).days == 0. Names using the previous
+            # winner are only created one occurrence ahead, so for those it's the next occurrence
+            following = next_date if NameReplacement.WINNER.value in tourney.name else timeline.beyond(tourney)
+            create_at = following - horizon + timedelta(seconds=1)
+            if not handled and next_date < timeline.end:
+                create_at = now
+            self.push(CREATE, create_at, now, rollover, handled, tourney.name)
+            if tourney.team_pm_template and tourney.team_restriction:
+                notify_at = next_date - timedelta(days=1, seconds=-1)
+                self.push(NOTIFY, notify_at, now, rollover, handled, tourney.name)
+        for kind in self.retries:
+            heapq.heappush(self.heap, (now + timedelta(seconds=RETRY_SECONDS), kind, 'retry after failure'))
+        self.retries = set()
+
+    def push(self, kind: str, at: datetime, now: datetime, rollover: datetime, handled: bool, name: str):
+        if at <= now:
+            at = rollover if handled else now
+        heapq.heappush(self.heap, (at, kind, name))
+
+    def sleep_until_next(self):
+        while True:
+            now = datetime.now(timezone.utc)
+            if len(self.heap) and self.heap[0][0] <= now:
+                return
+            remaining = MAX_SLEEP_SECONDS if not len(self.heap) else (self.heap[0][0] - now).total_seconds()
+            time.sleep(min(remaining, MAX_SLEEP_SECONDS))
+            if self.configs_changed(peek=True):
+                return
+
+    def pop_due(self) -> Set[str]:
+        now = datetime.now(timezone.utc)
+        due = set()
+        while len(self.heap) and self.heap[0][0] <= now:
+            due.add(heapq.heappop(self.heap)[1])
+        return due
+
+    def configs_changed(self, peek: bool = False) -> bool:
+        mtimes = config_mtimes()
+        changed = mtimes != self.mtimes
+        if not peek:
+            self.mtimes = mtimes
+        return changed
+
+    def timed(self, kind: str, run: Callable):
+        started = datetime.now(timezone.utc)
+        start = time.perf_counter()
+        try:
+            run()
+        except SystemExit:
+            # the loaders and api helpers quit() after printing what went wrong, serve has to outlive that
+            failure(f'{kind} failed, trying again in {RETRY_SECONDS // 60} minutes')
+            self.retries.add(kind)
+        except Exception as e:
+            failure(f'{kind} failed: {e}, trying again in {RETRY_SECONDS // 60} minutes')
+            self.retries.add(kind)
+        self.timings[kind] = {'started': started.isoformat(), 'seconds': round(time.perf_counter() - start, 3), 'failed': kind in self.retries}
+        # our own saves shouldn't count as an external edit
+        self.mtimes = config_mtimes()
+
+    def write_status(self):
+        upcoming = heapq.nsmallest(STATUS_QUEUE_LENGTH, self.heap)
+        status = {
+            'updated': datetime.now(timezone.utc).isoformat(),
+            'queued': len(self.heap),
+            'next': [{'at': at.isoformat(), 'kind': kind, 'tournament': name} for (at, kind, name) in upcoming],
+            'last_runs': self.timings,
+        }
+        with open(constants.SCHEDULER_STATUS_FILENAME, 'w') as statusFile:
+            statusFile.write(json.dumps(status, indent=4))
+
+def config_mtimes() -> tuple:
+    filenames = [constants.CONFIG_FILENAME, constants.USER_INFO_FILENAME, constants.TOURNAMENTS_FILENAME]
+    return tuple(os.path.getmtime(f) if os.path.exists(f) else None for f in filenames)
+
+def read_status() -> str:
+    if not os.path.exists(constants.SCHEDULER_STATUS_FILENAME):
+        return 'scheduler has not run yet'
+    with open(constants.SCHEDULER_STATUS_FILENAME, 'r') as statusFile:
+        return statusFile.read()